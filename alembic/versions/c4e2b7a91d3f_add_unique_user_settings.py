@@ -0,0 +1,36 @@
+"""Add unique constraint on user_settings (user_id, setting_id)
+
+Revision ID: c4e2b7a91d3f
+Revises: 80124a70cd07
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e2b7a91d3f'
+down_revision: Union[str, None] = '80124a70cd07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Удаляем дубликаты, оставляя самую раннюю запись
+    op.execute(sa.text("""
+        DELETE FROM user_settings a
+        USING user_settings b
+        WHERE a.user_id = b.user_id
+          AND a.setting_id = b.setting_id
+          AND a.id > b.id
+    """))
+    op.create_unique_constraint(
+        'uq_user_settings_user_id_setting_id', 'user_settings', ['user_id', 'setting_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_user_settings_user_id_setting_id', 'user_settings', type_='unique')
@@ -1,100 +1,173 @@
+import copy
 import logging
+import time
 
-from sqlalchemy import select
+from sqlalchemy import Text, bindparam, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, array, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
 from src.database import Setting, User, UserSettings
+from src.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Кэш настроек пользователя: (telegram_id, slug) -> (время получения, значение)
+SETTINGS_CACHE_TTL = 30
+_settings_cache = {}
+# Кэш всех настроек пользователя: telegram_id -> (время получения, словарь slug -> значение)
+_user_settings_cache = {}
+# Параллельные запросы всех настроек одного пользователя выполняются одним запросом
+_settings_flight = SingleFlight()
+# Счётчик изменений настроек пользователя: telegram_id -> номер версии
+_settings_versions = {}
 
-async def create_initial_user_settings(user_id: int, session: AsyncSession):
+
+def _cache_setting(user_id: int, setting_slug: str, value):
+    _settings_cache[(user_id, setting_slug)] = (time.monotonic(), copy.deepcopy(value))
+    cached = _user_settings_cache.get(user_id)
+    if cached:
+        cached[1][setting_slug] = copy.deepcopy(value)
+    _bump_settings_version(user_id)
+
+
+def _bump_settings_version(user_id: int):
+    # Запрос, начатый до записи, мог прочитать старые значения - новые чтения его не ждут
+    _settings_versions[user_id] = _settings_versions.get(user_id, 0) + 1
+    _settings_flight.forget(user_id)
+
+
+def invalidate_user_settings_cache(user_id: int):
+    """
+    Drops all cached settings of the user.
+    """
+    for key in [key for key in _settings_cache if key[0] == user_id]:
+        del _settings_cache[key]
+    _user_settings_cache.pop(user_id, None)
+    _bump_settings_version(user_id)
+
+
+async def create_initial_user_settings(user_id: int, session: AsyncSession, user: User | None = None):
     """
     Creates initial settings for a user by ensuring all default settings from `settings`
     are present in `user_settings` for the given user_id.
+    An already loaded `user` can be passed to skip looking it up again.
+    Returns the created settings as a slug -> value dict (empty if nothing was missing).
     """
     # Check if the user exists
-    stmt = select(User).where(User.telegram_id == user_id)
-    result = await session.execute(stmt)
-    user = result.unique().scalar_one_or_none()
+    if user is None:
+        stmt = (
+            select(User)
+            .where(User.telegram_id == user_id)
+            .limit(1)
+        )
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
     if not user:
         logger.error(f"Error: user with id:'{user_id}', not found")
         raise Exception('User not found')
 
-    # Fetch all settings
-    settings_query = await session.execute(select(Setting))
-    all_settings = settings_query.scalars().all()
-
-    # Fetch existing user settings
-    user_settings_query = await session.execute(
-        select(UserSettings.setting_id).where(UserSettings.user_id == user.id)
+    # Вставляем только отсутствующие настройки (NOT EXISTS), поэтому для пользователя со всеми
+    # настройками ничего не вставляется и значения последовательности id не расходуются.
+    # ON CONFLICT по уникальному индексу (user_id, setting_id) покрывает параллельные первые открытия меню
+    missing_select = select(literal(user.id), Setting.id, Setting.default_value).where(
+        ~select(UserSettings.id)
+        .where(UserSettings.user_id == user.id, UserSettings.setting_id == Setting.id)
+        .exists()
     )
-    existing_setting_ids = {us[0] for us in user_settings_query.fetchall()}
-
-    # Find missing settings
-    missing_settings = [setting for setting in all_settings if setting.id not in existing_setting_ids]
-
-    # Create missing user settings
+    inserted = (
+        pg_insert(UserSettings)
+        .from_select(['user_id', 'setting_id', 'value'], missing_select)
+        .on_conflict_do_nothing(index_elements=['user_id', 'setting_id'])
+        .returning(UserSettings.setting_id)
+        .cte('inserted')
+    )
+    missing_query = await session.execute(
+        select(Setting).join(inserted, inserted.c.setting_id == Setting.id)
+    )
+    missing_settings = missing_query.scalars().all()
     for setting in missing_settings:
-        user_setting = UserSettings(
-            user_id=user.id,
-            setting_id=setting.id,
-            value=setting.default_value  # Use the default value from `settings`
-        )
-        session.add(user_setting)
         logger.info(f"Added missing setting '{setting.name}' for user {user_id}")
 
     # Commit the changes
     await session.commit()
+    if missing_settings:
+        invalidate_user_settings_cache(user_id)
     logger.info(f"Initial user settings created/updated for user {user_id}")
+    return {setting.slug: setting.default_value for setting in missing_settings}
 
 
-async def get_user_settings(user_id: int, session: AsyncSession):
+async def get_user_settings_or_none(user_id: int, session: AsyncSession):
     """
-    Retrieves all settings for a given user.
+    Retrieves all settings for a given user in a single query joined from `users`.
+    Returns None if the user does not exist and an empty dict if it has no settings yet.
+    Results are cached for SETTINGS_CACHE_TTL seconds and concurrent calls
+    for the same user share one query.
     """
-    stmt = (
-        select(UserSettings)
-        .join(UserSettings.setting)
-        .join(UserSettings.user)
-        .where(User.telegram_id == user_id)
-        .options(joinedload(UserSettings.setting), joinedload(UserSettings.user))
+    cached = _user_settings_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+        return copy.deepcopy(cached[1])
+
+    async def load():
+        version = _settings_versions.get(user_id)
+        settings_dict = await _select_user_settings_or_none(user_id, session)
+        # Не кэшируем результат, если во время запроса настройки были изменены
+        if settings_dict is not None and _settings_versions.get(user_id) == version:
+            _user_settings_cache[user_id] = (time.monotonic(), copy.deepcopy(settings_dict))
+        return settings_dict
+
+    return copy.deepcopy(await _settings_flight.run(user_id, load))
+
+
+# Запросы горячего пути строятся один раз, значения передаются через bindparam
+_USER_SETTINGS_STMT = (
+    select(Setting.slug, UserSettings.value)
+    .select_from(User)
+    .outerjoin(UserSettings, UserSettings.user_id == User.id)
+    .outerjoin(Setting, Setting.id == UserSettings.setting_id)
+    .where(User.telegram_id == bindparam('telegram_id'))
+)
+_USER_SETTING_VALUE_STMT = (
+    select(UserSettings.value)
+    .join(Setting, Setting.id == UserSettings.setting_id)
+    .join(User, User.id == UserSettings.user_id)
+    .where(
+        User.telegram_id == bindparam('telegram_id'),
+        Setting.slug == bindparam('slug'),
     )
-    result = await session.execute(stmt)
-    user_settings = result.unique().scalars().all()
+)
+
 
-    settings_dict = {
-        user_setting.setting.slug: user_setting.value for user_setting in user_settings
-    }
+async def _select_user_settings_or_none(user_id: int, session: AsyncSession):
+    result = await session.execute(_USER_SETTINGS_STMT, {'telegram_id': user_id})
+    rows = result.all()
+    if not rows:
+        return None
 
-    logger.info(f"Retrieved settings for user {user_id}")
+    settings_dict = {slug: value for slug, value in rows if slug is not None}
+    logger.debug("Retrieved settings for user %s", user_id)
     return settings_dict
 
 
 async def get_user_setting(user_id: int, setting_slug: str, session: AsyncSession):
     """
     Retrieves a specific setting for a given user by setting slug.
+    Values are served from an in-process cache for SETTINGS_CACHE_TTL seconds.
     """
-    stmt = (
-        select(UserSettings.value)
-        .join(UserSettings.setting)
-        .join(UserSettings.user)
-        .where(
-            User.telegram_id == user_id,
-            Setting.slug == setting_slug,
-        )
-    )
-    print("STATEMENT", stmt)
-    print("SLUG", setting_slug)
-    result = await session.execute(stmt)
+    cached = _settings_cache.get((user_id, setting_slug))
+    if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+        # Возвращаем копию, чтобы изменения вызывающего кода не портили кэш
+        return copy.deepcopy(cached[1])
+
+    logger.debug("Querying setting '%s' for user %s", setting_slug, user_id)
+    result = await session.execute(_USER_SETTING_VALUE_STMT, {'telegram_id': user_id, 'slug': setting_slug})
     user_setting = result.scalar_one_or_none()
 
     if user_setting is None or user_setting == '':
         logger.error(f"Setting '{setting_slug}' not found for user {user_id}")
         raise Exception(f"Setting '{setting_slug}' not found for user {user_id}")
 
-    logger.info(f"Retrieved setting '{setting_slug}' for user {user_id}")
+    logger.debug("Retrieved setting '%s' for user %s", setting_slug, user_id)
+    _cache_setting(user_id, setting_slug, user_setting)
     return user_setting
 
 
@@ -144,6 +217,70 @@ async def update_user_setting(user_id: int, setting_slug: str, new_value, sessio
         logger.info(f"Updated setting '{setting_slug}' for user {user_id} to {new_value}")
 
     await session.commit()
+    _cache_setting(user_id, setting_slug, user_setting.value)
     return user_setting.value
 
 
+async def patch_user_setting(user_id: int, setting_slug: str, key: str, value, session: AsyncSession):
+    """
+    Updates a single key inside a JSON setting with one UPDATE ... RETURNING
+    instead of reading the whole value and writing it back.
+    Falls back to update_user_setting if the user has no such setting yet.
+    """
+    stmt = (
+        update(UserSettings)
+        .where(
+            UserSettings.user_id == User.id,
+            UserSettings.setting_id == Setting.id,
+            User.telegram_id == user_id,
+            Setting.slug == setting_slug,
+        )
+        .values(value=func.jsonb_set(UserSettings.value, array([key], type_=Text), cast(value, JSONB)))
+        .returning(UserSettings.value)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    new_value = result.scalar_one_or_none()
+
+    if new_value is None:
+        # У пользователя ещё нет этой настройки: берём значение по умолчанию и дополняем ключом
+        default_value = await session.scalar(
+            select(Setting.default_value).where(Setting.slug == setting_slug)
+        )
+        setting = copy.deepcopy(default_value) if isinstance(default_value, dict) else {}
+        setting[key] = value
+        return await update_user_setting(user_id, setting_slug, setting, session)
+
+    await session.commit()
+    logger.info(f"Patched setting '{setting_slug}.{key}' for user {user_id} to {value}")
+    _cache_setting(user_id, setting_slug, new_value)
+    return new_value
+
+
+async def toggle_user_setting(user_id: int, setting_slug: str, session: AsyncSession) -> bool:
+    """
+    Flips a boolean setting with a single UPDATE ... RETURNING and returns the new value.
+    Falls back to update_user_setting if the user has no such setting yet.
+    """
+    stmt = (
+        update(UserSettings)
+        .where(
+            UserSettings.user_id == User.id,
+            UserSettings.setting_id == Setting.id,
+            User.telegram_id == user_id,
+            Setting.slug == setting_slug,
+        )
+        .values(value=func.to_jsonb(func.coalesce(UserSettings.value != cast(True, JSONB), True)))
+        .returning(UserSettings.value)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    new_value = result.scalar_one_or_none()
+
+    if new_value is None:
+        return await update_user_setting(user_id, setting_slug, True, session)
+
+    await session.commit()
+    logger.info(f"Toggled setting '{setting_slug}' for user {user_id} to {new_value}")
+    _cache_setting(user_id, setting_slug, new_value)
+    return new_value
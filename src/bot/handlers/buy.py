@@ -1,3 +1,4 @@
+import functools
 import traceback
 from datetime import datetime
 
@@ -8,7 +9,6 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ForceReply
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-import re
 from typing import Union
 from aiogram.filters import StateFilter
 
@@ -16,11 +16,12 @@ from src.services.solana_service import SolanaService
 from src.services.token_info import TokenInfoService
 from src.database.models import User, LimitOrder, Trade, TransactionType
 from .start import get_real_user_id
+from ..utils import parse_number, is_valid_token_address
 from src.solana_module.transaction_handler import UserTransactionHandler
 from src.bot.states import BuyStates, AutoBuySettingsStates, LimitBuyStates
 from solders.pubkey import Pubkey
 from src.solana_module.utils import get_bonding_curve_address
-from ..crud import get_user_setting, update_user_setting
+from ..crud import get_user_setting, update_user_setting, patch_user_setting
 #from bot import bot
 
 
@@ -29,19 +30,11 @@ logger = logging.getLogger(__name__)
 router = Router()
 token_info_service = TokenInfoService()
 
-# Регулярное выражение для определения mint адреса
-MINT_ADDRESS_PATTERN = r'^[123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz]{44}$'
-
-
-def _is_valid_token_address(address: str) -> bool:
-    """Проверяет валидность адреса токена"""
-    try:
-        return bool(re.match(MINT_ADDRESS_PATTERN, address))
-    except Exception:
-        logger.error(f"Invalid token address: {address}")
-        return False
+# Таблица замены обычных цифр на маленькие (подстрочные) для str.translate
+_SMALL_DIGITS_TABLE = str.maketrans("0123456789", "₀₁₂₃₄₅₆₇₈₉")
 
 
+@functools.lru_cache(maxsize=4096, typed=True)
 def _format_price(amount, format_length=2) -> str:
     def decimal_to_plain_string(exp_str: str) -> str:
         """
@@ -56,7 +49,7 @@ def _format_price(amount, format_length=2) -> str:
 
         # Превращаем кортеж цифр в строку.
         # Например, digits = (3, 0, 1, 4, ...) => "3014..."
-        digits_str = "".join(str(dig) for dig in digits)
+        digits_str = "".join(map(str, digits))
 
         # Если все цифры — это просто "0", значит число равно 0:
         if all(dig == 0 for dig in digits):
@@ -98,11 +91,6 @@ def _format_price(amount, format_length=2) -> str:
         return result
     """Форматирует цену в читаемый вид с маленькими цифрами после точки"""
     amount = Decimal(str(amount))
-    # Юникод для маленьких цифр
-    small_digits = {
-        '0': '₀', '1': '₁', '2': '₂', '3': '₃', '4': '₄',
-        '5': '₅', '6': '₆', '7': '₇', '8': '₈', '9': '₉'
-    }
 
     def to_small_and_normal_digits(number: Decimal, digits=2) -> str:
         """Преобразует число в строку, заменяя нули на маленькие цифры, а остальные на обычные"""
@@ -115,9 +103,9 @@ def _format_price(amount, format_length=2) -> str:
 
         # Преобразуем эти нули в маленькие цифры, если больше 6 нулей
         if leading_zeros > 2:
-            frac_part_small = ''.join(small_digits[digit] for digit in str(leading_zeros))
+            frac_part_small = str(leading_zeros).translate(_SMALL_DIGITS_TABLE)
         else:
-            frac_part_small = ''.join('0' for _ in range(leading_zeros))
+            frac_part_small = '0' * leading_zeros
 
         # Оставшиеся цифры — обычные
         frac_part_normal = frac_part[leading_zeros:(leading_zeros + 5)]
@@ -133,6 +121,12 @@ def _format_price(amount, format_length=2) -> str:
         return f"{amount:.{format_length}f}"
 
 
+@functools.lru_cache(maxsize=256, typed=True)
+def _gas_fee_button_text(gas_fee) -> str:
+    """Текст кнопки Gas Fee; gas_fee в лампортах, пользователи выбирают всего несколько значений"""
+    return f"🚀 Gas Fee {': ' + _format_price(gas_fee / 1e9) + ' SOL' if gas_fee else ''}"
+
+
 
 @router.callback_query(F.data == "buy", flags={"priority": 3})
 async def on_buy_button(callback_query: types.CallbackQuery, state: FSMContext):
@@ -190,7 +184,7 @@ async def get_sol_update_keyboard(state: FSMContext, prefix="buy"):
         ],
         [
             InlineKeyboardButton(
-                text=f"🚀 Gas Fee {': ' + _format_price(gas_fee / 1e9) + ' SOL' if gas_fee else ''}",
+                text=_gas_fee_button_text(gas_fee),
                 callback_data=f"{prefix}_set_gas_fee"
             )
         ]
@@ -205,7 +199,7 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
     try:
         token_address = message.text.strip()
 
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             await message.reply(
                 "❌ Неверный адрес токена\n"
                 "Пожалуйста, проверьте адрес и попробуйте снова"
@@ -536,9 +530,7 @@ async def handle_slippage_choice(callback_query: types.CallbackQuery, state: FSM
         slippage = float(choice)
         user_id = get_real_user_id(callback_query)
 
-        buy_setting = await get_user_setting(user_id, 'buy', session)
-        buy_setting['slippage'] = slippage
-        await update_user_setting(user_id, 'buy', buy_setting, session)
+        await patch_user_setting(user_id, 'buy', 'slippage', slippage, session)
         await state.update_data(slippage=slippage)
         await show_buy_menu(callback_query.message, state, session, callback_query.from_user.id)
 
@@ -551,15 +543,13 @@ async def handle_slippage_choice(callback_query: types.CallbackQuery, state: FSM
 async def handle_custom_slippage(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Handle custom slippage input"""
     try:
-        slippage = float(callback_query.text.replace(",", "."))
+        slippage = parse_number(callback_query.text)
         if slippage <= 0 or slippage > 100:
             raise ValueError("Invalid slippage value")
 
         user_id = get_real_user_id(callback_query)
 
-        buy_setting = await get_user_setting(user_id, 'buy', session)
-        buy_setting['slippage'] = slippage
-        await update_user_setting(user_id, 'buy', buy_setting, session)
+        await patch_user_setting(user_id, 'buy', 'slippage', slippage, session)
         await state.update_data(slippage=slippage)
 
         # Отправляем новое сообщение об успешном изменении
@@ -598,15 +588,13 @@ async def handle_set_gas_fee(callback_query: types.CallbackQuery, state: FSMCont
 async def handle_custom_gas_fee(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Handle custom slippage input"""
     try:
-        gas_fee = float(callback_query.text.replace(",", "."))
+        gas_fee = parse_number(callback_query.text)
         if gas_fee <= 0 or gas_fee > 10:
             raise ValueError("Invalid gas_fee value")
         gas_fee *= 1e9
         user_id = get_real_user_id(callback_query)
 
-        buy_setting = await get_user_setting(user_id, 'buy', session)
-        buy_setting['gas_fee'] = gas_fee
-        await update_user_setting(user_id, 'buy', buy_setting, session)
+        await patch_user_setting(user_id, 'buy', 'gas_fee', gas_fee, session)
         await state.update_data(gas_fee=gas_fee)
 
         # Отправляем новое сообщение об успешном изменении
@@ -1411,7 +1399,7 @@ async def handle_auto_buy(message: types.Message, state: FSMContext, session: As
 
         # Проверяем, является ли сообщение mint адресом
         token_address = message.text.strip()
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             return
 
         logger.info(f"Detected mint address: {token_address}")
@@ -7,23 +7,13 @@ from aiogram import F
 
 from src.services.rugcheck import RugCheckService
 from src.bot.states import RugCheckStates
+from src.bot.utils import is_valid_token_address
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 
-def _is_valid_token_address(address: str) -> bool:
-    """Проверяет валидность адреса токена"""
-    try:
-        if len(address) != 44:
-            return False
-        valid_chars = set("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
-        return all(c in valid_chars for c in address)
-    except Exception:
-        return False
-
-
 @router.callback_query(F.data == "rugcheck", flags={"priority": 5})
 async def on_rugcheck_button(callback_query: types.CallbackQuery, state: FSMContext):
     """Обработчик нажатия кнопки Проверка на скам"""
@@ -46,7 +36,7 @@ async def handle_token_input(message: types.Message, state: FSMContext):
         token_address = message.text.strip()
 
         # Проверяем валидность адреса
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             await message.reply(
                 "❌ Неверный адрес токена\n"
                 "Пожалуйста, отправьте корректный адрес токена",
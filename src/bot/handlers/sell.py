@@ -1,4 +1,7 @@
+import asyncio
+import functools
 import logging
+from datetime import datetime, timezone
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ForceReply
@@ -9,12 +12,15 @@ from solders.pubkey import Pubkey
 from src.services.solana_service import SolanaService
 from src.services.token_info import TokenInfoService
 from src.database.models import User, Trade, TransactionType
-from .buy import _format_price
+from .buy import _format_price, _gas_fee_button_text
 from .start import get_real_user_id
-from src.solana_module.transaction_handler import UserTransactionHandler
+from src.bot.utils import parse_number, is_valid_token_address
+from src.solana_module.transaction_handler import (
+    UserTransactionHandler, get_cached_user_handler, cache_user_handler
+)
 from src.solana_module.utils import get_bonding_curve_address, find_associated_bonding_curve
 from src.bot.states import SellStates
-from src.bot.crud import get_user_setting, update_user_setting
+from src.bot.crud import get_user_setting, patch_user_setting
 from src.solana_module.solana_client import SolanaClient
 from src.solana_module.token_info import token_info
 import traceback
@@ -24,93 +30,191 @@ logger = logging.getLogger(__name__)
 router = Router()
 token_info_service = TokenInfoService()
 
-
-def _is_valid_token_address(address: str) -> bool:
-    """Проверяет валидность адреса токена"""
-    try:
-        if len(address) != 44:
-            return False
-        valid_chars = set("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
-        return all(c in valid_chars for c in address)
-    except Exception:
-        return False
+# Статичные клавиатуры создаются один раз и переиспользуются во всех ответах
+_BACK_ROW = [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
+_BACK_KB = InlineKeyboardMarkup(inline_keyboard=[_BACK_ROW])
+_BACK_TO_MAIN_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
+])
+_BACK_TO_SELL_ROW = [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_sell")]
+_BACK_TO_SELL_KB = InlineKeyboardMarkup(inline_keyboard=[_BACK_TO_SELL_ROW])
+_BACK_TO_TOKENS_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад", callback_data="sell")]
+])
+
+# Неизменяемые строки клавиатуры меню продажи
+_SELL_KB_FIRST_ROW = [
+    InlineKeyboardButton(text="🔴 Продать", callback_data="market_sell"),
+    InlineKeyboardButton(text="📊 Лимитный", callback_data="limit_sell")
+]
+_SELL_KB_TAIL_ROWS = [
+    [InlineKeyboardButton(text="💰 Продать", callback_data="confirm_sell")],
+    _BACK_ROW
+]
+
+_SELL_PERCENT_PRESETS = (25, 50, 75, 100)
+# Для каждого процента: (обычная кнопка, отмеченная кнопка)
+_SELL_PERCENT_BUTTONS = {
+    val: (
+        InlineKeyboardButton(text=f"{val}%", callback_data=f"sell_{val}"),
+        InlineKeyboardButton(text=f"✅️ {val}%", callback_data=f"sell_{val}")
+    )
+    for val in _SELL_PERCENT_PRESETS
+}
+
+_SLIPPAGE_PRESETS = (0.5, 1, 2, 3, 5)
+
+
+def _build_slippage_keyboard(chosen_slippage, custom_text: str = " Custom") -> InlineKeyboardMarkup:
+    preset_buttons = [
+        InlineKeyboardButton(text=f"{'✅️' if value == chosen_slippage else ''} {value}%",
+                             callback_data=f"sell_slippage_{value}")
+        for value in _SLIPPAGE_PRESETS
+    ]
+    custom_button = InlineKeyboardButton(text=custom_text, callback_data="sell_slippage_custom")
+    return InlineKeyboardMarkup(inline_keyboard=[
+        preset_buttons[:3],
+        preset_buttons[3:] + [custom_button],
+        _BACK_TO_SELL_ROW
+    ])
+
+
+# Клавиатура для каждого стандартного значения (и для "не выбрано") строится один раз
+_SLIPPAGE_KEYBOARDS = {value: _build_slippage_keyboard(value) for value in (None,) + _SLIPPAGE_PRESETS}
+
+
+def get_slippage_keyboard(chosen_slippage) -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру выбора slippage с отмеченным текущим значением"""
+    if not chosen_slippage:
+        return _SLIPPAGE_KEYBOARDS[None]
+    if chosen_slippage in _SLIPPAGE_KEYBOARDS:
+        return _SLIPPAGE_KEYBOARDS[chosen_slippage]
+    return _build_slippage_keyboard(chosen_slippage, f"✅️ {_format_price(chosen_slippage)} Custom")
+
+
+# Шаблон меню продажи разбирается один раз при загрузке модуля
+_SELL_MENU_TMPL = (
+    "${symbol} 📈 - {name}\n\n"
+    "📍 Адрес токена:\n`{address}`\n\n"
+    "💰 Баланс: {balance} токенов (${balance_usd})\n"
+    "⚙️ Slippage: {slippage}%\n\n"
+    "📊 Информация о токене:\n"
+    "• Price: ${price}\n"
+    "• MC: ${mc}\n"
+    "• Renounced: {renounced} Burnt: {burnt}\n\n"
+    "🔍 Анализ: [Pump](https://www.pump.fun/{address})"
+)
+
+
+def _render_sell_menu_text(token_info, token_address: str, token_balance: float, slippage) -> str:
+    """Собирает текст меню продажи по шаблону"""
+    return _SELL_MENU_TMPL.format_map({
+        "symbol": token_info.symbol,
+        "name": token_info.name,
+        "address": token_address,
+        "balance": _format_price(token_balance),
+        "balance_usd": _format_price(token_balance * token_info.price_usd),
+        "slippage": slippage,
+        "price": _format_price(token_info.price_usd),
+        "mc": _format_price(token_info.market_cap),
+        "renounced": "✅️" if token_info.is_renounced else "✗",
+        "burnt": "✅️" if token_info.is_burnt else "✗",
+    })
 
 
 @router.callback_query(F.data == "sell", flags={"priority": 3})
-async def on_sell_button(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def on_sell_button(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession,
+                         user: User | None):
     """Handle sell button press"""
     try:
+        # Сразу убираем "часики" с кнопки, дальше идут RPC запросы
+        await callback_query.answer()
         await state.set_state(SellStates.waiting_for_token)
 
-        # Get user's token balance
-        user_id = get_real_user_id(callback_query)
-        stmt = select(User).where(User.telegram_id == user_id)
-        result = await session.execute(stmt)
-        user = result.unique().scalar_one_or_none()
-
         if not user:
-            await callback_query.answer("❌ Пользователь не найден")
+            await callback_query.message.answer("❌ Пользователь не найден")
             return
 
         # Create SolanaClient instance
         solana_client = SolanaClient(compute_unit_price=100000)  # Default compute unit price
-        
-        # Get user's tokens
-        tx_handler = UserTransactionHandler(user.private_key, 10000000)
-        tokens = await solana_client.get_tokens(user.solana_wallet, tx_handler)
+
+        # Get user's tokens (all balances come from a single RPC call)
+        tokens = await solana_client.get_tokens(user.solana_wallet)
         
         if not tokens:
             await callback_query.message.edit_text(
                 "❌ У вас нет токенов для продажи",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_KB
             )
             return
 
-        # Create keyboard with tokens
-        keyboard = []
-        for token_address, market_cap, name, symbol, balance in tokens:
-            keyboard.append([
-                InlineKeyboardButton(
-                    text=f"💎 {symbol} ({name} - ${_format_price(balance)})",
-                    callback_data=f"select_token_{token_address}"
-                )
-            ])
+        # Create keyboard with tokens and the back button
+        keyboard = [
+            [InlineKeyboardButton(
+                text=f"💎 {symbol} ({name} - ${_format_price(balance)})",
+                callback_data=f"select_token_{token_address}"
+            )]
+            for token_address, market_cap, name, symbol, balance, amount in tokens
+        ]
+        keyboard.append(_BACK_ROW)
 
-        # Add back button
-        keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")])
+        # Запоминаем балансы, чтобы не запрашивать их повторно при выборе токена
+        await state.update_data(token_balances={token[0]: token[5] for token in tokens})
 
         await callback_query.message.edit_text(
             "🔴 Выберите токен для продажи:",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
         )
 
-        await state.set_state(SellStates.waiting_for_token)
-
     except Exception as e:
-        traceback.format_exc()
         logger.error(f"Error in sell button handler: {e}")
         traceback.print_exc()
         await callback_query.message.edit_text(
             "❌ Произошла ошибка при получении списка токенов",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-            ])
+            reply_markup=_BACK_KB
+        )
+
+async def _get_tx_handler(user_id: int, compute_unit_price: int, session: AsyncSession,
+                          user: User | None = None) -> UserTransactionHandler | None:
+    """
+    Возвращает закэшированный обработчик транзакций пользователя, при промахе создаёт его.
+    compute_unit_price задаёт только цену по умолчанию нового обработчика - для транзакций
+    цену нужно передавать в каждый вызов
+    """
+    tx_handler = get_cached_user_handler(user_id)
+    if tx_handler is not None:
+        return tx_handler
+
+    if user is None:
+        stmt = (
+            select(User)
+            .where(User.telegram_id == user_id)
+            .limit(1)
         )
+        user = (await session.execute(stmt)).scalar_one_or_none()
+        if user is None:
+            return None
+
+    return await cache_user_handler(user_id, UserTransactionHandler(user.private_key, compute_unit_price))
+
 
 # Добавляем новый обработчик для выбора токена из списка
-@router.callback_query(lambda c: c.data.startswith("select_token_"), flags={"priority": 3})
+@router.callback_query(F.data.startswith("select_token_"), flags={"priority": 3})
 async def handle_token_selection(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     try:
+        await callback_query.answer()
         token_address = callback_query.data.replace("select_token_", "")
         
         # Store token address in state
         user_id = get_real_user_id(callback_query)
-        stmt = await session.execute(select(User).where(User.telegram_id == user_id))
-        user = stmt.unique().scalar_one_or_none()
-        tx_handler = UserTransactionHandler(user.private_key, 10000000)
-        token_balance = await tx_handler.client.get_token_balance(Pubkey.from_string(token_address))
+        tx_handler = await _get_tx_handler(user_id, 10000000, session)
+        if tx_handler is None:
+            await callback_query.message.answer("❌ Пользователь не найден")
+            return
+        data = await state.get_data()
+        token_balance = data.get('token_balances', {}).get(token_address)
+        if token_balance is None:
+            token_balance = await tx_handler.client.get_token_balance(Pubkey.from_string(token_address))
 
         mint = Pubkey.from_string(token_address)
         bonding_curve, _ = get_bonding_curve_address(mint, tx_handler.client.PUMP_PROGRAM)
@@ -139,27 +243,25 @@ async def handle_token_selection(callback_query: types.CallbackQuery, state: FSM
         traceback.print_exc()
         await callback_query.message.edit_text(
             "❌ Произошла ошибка при выборе токена",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад", callback_data="sell")]
-            ])
+            reply_markup=_BACK_TO_TOKENS_KB
         )
 
 
 @router.message(F.text.startswith("token_"), flags={"priority": 2})
 async def on_token_selected_via_link(message: types.Message, state: FSMContext, session: AsyncSession,
-                                     solana_service: SolanaService):
+                                     solana_service: SolanaService, user: User | None):
     message.text = message.text.split("_")[1]
-    await handle_token_input(message, state, session, solana_service)
+    await handle_token_input(message, state, session, solana_service, user)
 
 
 @router.message(SellStates.waiting_for_token, flags={"priority": 2})
 async def handle_token_input(message: types.Message, state: FSMContext, session: AsyncSession,
-                             solana_service: SolanaService):
+                             solana_service: SolanaService, user: User | None):
     """Handle token address input"""
     try:
         token_address = message.text.strip()
 
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             await message.reply(
                 "❌ Неверный формат адреса токена\n"
                 "Пожалуйста, введите корректный адрес:",
@@ -169,9 +271,6 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
 
         # Get user's token balance
         user_id = get_real_user_id(message)
-        stmt = select(User).where(User.telegram_id == user_id)
-        sell_setting = await session.execute(stmt)
-        user = sell_setting.unique().scalar_one_or_none()
 
         if not user:
             await message.reply("❌ Пользователь не найден")
@@ -179,15 +278,17 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
 
         try:
             sell_settings = await get_user_setting(user_id, 'sell', session)
-            tx_handler = UserTransactionHandler(user.private_key, sell_settings['gas_fee'])
-            token_balance = await tx_handler.client.get_token_balance(Pubkey.from_string(token_address))
+            tx_handler = await _get_tx_handler(user_id, sell_settings['gas_fee'], session, user)
+            # Баланс (RPC) и информация о токене (HTTP) не зависят друг от друга
+            token_balance, token_info = await asyncio.gather(
+                tx_handler.client.get_token_balance(Pubkey.from_string(token_address)),
+                token_info_service.get_token_info(token_address)
+            )
 
             if token_balance <= 0:
                 await message.reply(
                     "❌ У вас нет этого токена",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                    ])
+                    reply_markup=_BACK_TO_MAIN_KB
                 )
                 return
 
@@ -195,9 +296,7 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
             logger.error(f"Error getting token balance: {e}")
             await message.reply(
                 "❌ Ошибка при получении баланса токена",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_TO_MAIN_KB
             )
             return
 
@@ -207,9 +306,8 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
         associated_bonding_curve = find_associated_bonding_curve(mint, bonding_curve)
 
         # Save token data to state
-        sell_setting = await get_user_setting(user_id, 'sell', session)
-        slippage = sell_setting['slippage']
-        gas_fee = sell_setting['gas_fee']
+        slippage = sell_settings['slippage']
+        gas_fee = sell_settings['gas_fee']
         await state.update_data({
             'token_address': token_address,
             'bonding_curve': str(bonding_curve),
@@ -222,32 +320,14 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
         })
 
         sell_percentage = 100
-        # Get token info
-        token_info = await token_info_service.get_token_info(token_address)
         if not token_info:
             await message.reply("❌ Не удалось получить информацию о токене")
             return
 
         # Формируем клавиатуру
-        user_id = get_real_user_id(message)
-        stmt = select(User.last_buy_amount).where(User.telegram_id == user_id)
-        sell_setting = await session.execute(stmt)
-        last_buy_amount = sell_setting.scalar()
+        keyboard = get_sell_keyboard_list(slippage, user.last_buy_amount, sell_percentage, gas_fee)
 
-        keyboard = get_sell_keyboard_list(slippage, last_buy_amount, sell_percentage, gas_fee)
-
-        message_text = (
-            f"${token_info.symbol} 📈 - {token_info.name}\n\n"
-            f"📍 Адрес токена:\n`{token_address}`\n\n"
-            f"💰 Баланс: {_format_price(token_balance)} токенов (${_format_price(token_balance * token_info.price_usd)})\n"
-            f"⚙️ Slippage: {slippage}%\n\n"
-            f"📊 Информация о токене:\n"
-            f"• Price: ${_format_price(token_info.price_usd)}\n"
-            f"• MC: ${_format_price(token_info.market_cap)}\n"
-            f"• Renounced: {'✅️' if token_info.is_renounced else '✗'} "
-            f"Burnt: {'✅️' if token_info.is_burnt else '✗'}\n\n"
-            f"🔍 Анализ: [Pump](https://www.pump.fun/{token_address})"
-        )
+        message_text = _render_sell_menu_text(token_info, token_address, token_balance, slippage)
 
         await message.reply(
             message_text,
@@ -260,27 +340,23 @@ async def handle_token_input(message: types.Message, state: FSMContext, session:
         logger.error(f"Error processing token address: {e}")
         await message.reply(
             "❌ Произошла ошибка при обработке адреса токена",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-            ])
+            reply_markup=_BACK_TO_MAIN_KB
         )
 
 
-@router.callback_query(lambda c: c.data == "confirm_sell")
-async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+@router.callback_query(F.data == "confirm_sell")
+async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession,
+                              user: User | None):
     """Handle sell confirmation"""
     try:
+        await callback_query.answer()
         # Get user data
         user_id = get_real_user_id(callback_query)
         logger.info(f"Processing sell confirmation for user: {user_id}")
 
-        stmt = select(User).where(User.telegram_id == user_id)
-        result = await session.execute(stmt)
-        user = result.unique().scalar_one_or_none()
-
         if not user:
             logger.error(f"User not found: {user_id}")
-            await callback_query.answer("❌ Пользователь не найден")
+            await callback_query.message.answer("❌ Пользователь не найден")
             return
 
         # Get state data
@@ -292,29 +368,29 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
 
         if not token_address:
             logger.error("Missing token address")
-            await callback_query.answer("❌ Не указан токен")
+            await callback_query.message.answer("❌ Не указан токен")
             return
 
         # Initialize transaction handler with user's private key
         try:
             logger.info("Initializing transaction handler")
             sell_settings = await get_user_setting(user_id, 'sell', session)
-            tx_handler = UserTransactionHandler(user.private_key, sell_settings['gas_fee'])
+            tx_handler = await _get_tx_handler(user_id, sell_settings['gas_fee'], session, user)
         except ValueError:
             logger.error("Failed to initialize transaction handler")
-            await callback_query.answer("❌ Ошибка инициализации кошелька")
+            await callback_query.message.answer("❌ Ошибка инициализации кошелька")
             return
 
-        # Send status message
-        status_message = await callback_query.message.answer(
-            "🔄 Выполняется продажа токена...\n"
-            "Пожалуйста, подождите"
-        )
-
-        # Get current token price
+        # Send status message and get current token price concurrently
         mint = Pubkey.from_string(token_address)
         bonding_curve, _ = get_bonding_curve_address(mint, tx_handler.client.PUMP_PROGRAM)
-        curve_state = await tx_handler.client.get_pump_curve_state(bonding_curve)
+        status_message, curve_state = await asyncio.gather(
+            callback_query.message.answer(
+                "🔄 Выполняется продажа токена...\n"
+                "Пожалуйста, подождите"
+            ),
+            tx_handler.client.get_pump_curve_state(bonding_curve)
+        )
         current_price_sol = tx_handler.client.calculate_pump_curve_price(curve_state)
 
         # Calculate amount of tokens to sell based on percentage or initial amount
@@ -326,9 +402,7 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
                 await status_message.edit_text(
                     "❌ Не найдена предыдущая транзакция покупки\n"
                     "Пожалуйста, выберите другую сумму для продажи",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_sell")]
-                    ])
+                    reply_markup=_BACK_TO_SELL_KB
                 )
                 return
 
@@ -348,7 +422,8 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
         tx_signature = await tx_handler.sell_token(
             token_address=token_address,
             amount_tokens=amount_tokens,
-            slippage=slippage
+            slippage=slippage,
+            compute_unit_price=sell_settings['gas_fee']
         )
 
         if tx_signature:
@@ -364,9 +439,7 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
                 f"🔗 Транзакция: [Explorer](https://solscan.io/tx/{tx_signature})",
                 parse_mode="MARKDOWN",
                 disable_web_page_preview=True,
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_TO_MAIN_KB
             )
             trade = Trade(
                 user_id=user.id,
@@ -374,7 +447,7 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
                 amount=amount_tokens,
                 price_usd=current_price_sol,
                 amount_sol=amount_tokens * current_price_sol,
-                created_at=datetime.now(),
+                created_at=datetime.now(timezone.utc),
                 transaction_type=1,
                 status="SUCCESS",
                 gas_fee=sell_settings['gas_fee'],
@@ -388,9 +461,7 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
             await status_message.edit_text(
                 "❌ Ошибка при продаже токена\n"
                 "Пожалуйста, попробуйте позже",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_TO_MAIN_KB
             )
 
         # Clear state
@@ -398,11 +469,11 @@ async def handle_confirm_sell(callback_query: types.CallbackQuery, state: FSMCon
 
     except Exception as e:
         logger.error(f"Error confirming sell: {e}")
-        await callback_query.answer("❌ Произошла ошибка")
+        await callback_query.message.answer("❌ Произошла ошибка")
         await state.clear()
 
 
-@router.callback_query(lambda c: c.data == "sell_set_slippage", flags={"priority": 20})
+@router.callback_query(F.data == "sell_set_slippage", flags={"priority": 20})
 async def handle_set_slippage(callback_query: types.CallbackQuery, state: FSMContext):
     """Handle slippage setting button"""
     try:
@@ -416,25 +487,7 @@ async def handle_set_slippage(callback_query: types.CallbackQuery, state: FSMCon
         # Save sell context
         await state.update_data(menu_type="sell")
 
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text=f"{'✅️' if chosen_slippage == 0.05 else ''} 0.5%",
-                                     callback_data="sell_slippage_0.5"),
-                InlineKeyboardButton(text=f"{'✅️' if chosen_slippage == 1 else ''} 1%",
-                                     callback_data="sell_slippage_1"),
-                InlineKeyboardButton(text=f"{'✅️' if chosen_slippage == 2 else ''} 2%", callback_data="sell_slippage_2")
-            ],
-            [
-                InlineKeyboardButton(text=f"{'✅️' if chosen_slippage == 3 else ''} 3%",
-                                     callback_data="sell_slippage_3"),
-                InlineKeyboardButton(text=f"{'✅️' if chosen_slippage == 5 else ''} 5%",
-                                     callback_data="sell_slippage_5"),
-                InlineKeyboardButton(
-                    text=f"{'✅️ ' + str(_format_price(chosen_slippage)) if chosen_slippage and chosen_slippage not in [0.05, 1, 2, 3, 5] else ''} Custom",
-                    callback_data="sell_slippage_custom")
-            ],
-            [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_sell")]
-        ])
+        keyboard = get_slippage_keyboard(chosen_slippage)
 
         await callback_query.message.edit_text(
             "⚙️ Настройка Slippage для продажи\n\n"
@@ -449,7 +502,7 @@ async def handle_set_slippage(callback_query: types.CallbackQuery, state: FSMCon
         await callback_query.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(lambda c: c.data.startswith("sell_slippage_"), flags={"priority": 20})
+@router.callback_query(F.data.startswith("sell_slippage_"), flags={"priority": 20})
 async def handle_slippage_choice(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Handle slippage choice"""
     try:
@@ -474,9 +527,7 @@ async def handle_slippage_choice(callback_query: types.CallbackQuery, state: FSM
         slippage = float(choice)
         user_id = get_real_user_id(callback_query)
 
-        sell_setting = await get_user_setting(user_id, 'sell', session)
-        sell_setting['slippage'] = slippage
-        await update_user_setting(user_id, 'sell', sell_setting, session)
+        await patch_user_setting(user_id, 'sell', 'slippage', slippage, session)
         await state.update_data(slippage=slippage)
         await show_sell_menu(callback_query.message, state, session)
 
@@ -485,7 +536,7 @@ async def handle_slippage_choice(callback_query: types.CallbackQuery, state: FSM
         await callback_query.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(lambda c: c.data == "back_to_sell", flags={"priority": 3})
+@router.callback_query(F.data == "back_to_sell", flags={"priority": 3})
 async def handle_back_to_sell(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Return to sell menu"""
     logger.info("[SELL] Handling back_to_sell")
@@ -495,16 +546,16 @@ async def handle_back_to_sell(callback_query: types.CallbackQuery, state: FSMCon
     logger.info("[SELL] Showed sell menu")
 
 
-@router.callback_query(lambda c: c.data.startswith("sell_"), flags={"priority": 8})
+@router.callback_query(F.data.startswith("sell_"), flags={"priority": 8})
 async def handle_sell_percentage(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Handle sell percentage buttons"""
     try:
+        await callback_query.answer()
         # Extract percentage from callback data
         sell_type = callback_query.data.split("_", 1)[1]
 
         if sell_type == "initial":
-            # Save special type to state
-            await state.update_data(sell_percentage="initial")
+            # Special type, saved to state below
             percentage = "initial"
         elif sell_type == "set_gas_fee":
             await callback_query.message.answer(
@@ -526,53 +577,34 @@ async def handle_sell_percentage(callback_query: types.CallbackQuery, state: FSM
         else:
             # Convert percentage to float and save to state
             percentage = float(sell_type)
-        await state.update_data(sell_percentage=percentage)
-
-        # Update message with selected percentage
         data = await state.get_data()
-        token_address = data.get("token_address")
-        slippage = data.get("slippage")
-        gas_fee = data.get('gas_fee')
-
-        # Get token info
-        token_info = await token_info_service.get_token_info(token_address)
-        if not token_info:
-            await callback_query.answer("❌ Не удалось получить информацию о токене")
+        if data.get("sell_percentage") == percentage:
+            # Выбран тот же процент - клавиатура не изменится
             return
+        await state.update_data(sell_percentage=percentage)
 
+        # Текст меню не зависит от процента, поэтому обновляем только клавиатуру
         user_id = get_real_user_id(callback_query)
         stmt = select(User.last_buy_amount).where(User.telegram_id == user_id)
         result = await session.execute(stmt)
         last_buy_amount = result.scalar()
-        keyboard = get_sell_keyboard_list(slippage, last_buy_amount, percentage, gas_fee)
-
-        message_text = (
-            f"${token_info.symbol} 📈 - {token_info.name}\n\n"
-            f"📍 Адрес токена:\n`{token_address}`\n\n"
-            f"💰 Выбранный тип продажи: {percentage if percentage == 'initial' else str(percentage) + '%'}\n"
-            f"⚙️ Slippage: {slippage}%\n\n"
-            f"📊 Информация о токене:\n"
-            f"• Price: ${_format_price(token_info.price_usd)}\n"
-            f"• MC: ${_format_price(token_info.market_cap)}\n"
-            f"• Renounced: {'✅️' if token_info.is_renounced else '✗'} "
-            f"Burnt: {'✅️' if token_info.is_burnt else '✗'}\n\n"
-            f"🔍 Анализ: [Pump](https://www.pump.fun/{token_address})"
-        )
+        keyboard = get_sell_keyboard_list(data.get("slippage"), last_buy_amount, percentage, data.get("gas_fee"))
 
-        await callback_query.message.edit_text(
-            message_text,
-            reply_markup=keyboard,
-            parse_mode="MARKDOWN",
-            disable_web_page_preview=True
-        )
+        await callback_query.message.edit_reply_markup(reply_markup=keyboard)
 
     except Exception as e:
         logger.error(f"Error handling sell percentage: {e}")
-        await callback_query.answer("❌ Произошла ошибка")
+        await callback_query.message.answer("❌ Произошла ошибка")
 
 
-async def show_sell_menu(message: types.Message, state: FSMContext, session: AsyncSession):
-    """Show sell menu with current token info and settings"""
+async def show_sell_menu(message: types.Message, state: FSMContext, session: AsyncSession,
+                         banner: str = "", new_message: bool = False):
+    """
+    Show sell menu with current token info and settings.
+    banner is prepended to the menu text; with new_message the menu is sent
+    as a new message instead of editing `message`.
+    """
+    send = message.answer if new_message else message.edit_text
     try:
         # Get current data
 
@@ -586,11 +618,9 @@ async def show_sell_menu(message: types.Message, state: FSMContext, session: Asy
         # Get token info
         token_info = await token_info_service.get_token_info(token_address)
         if not token_info:
-            await message.edit_text(
+            await send(
                 "❌ Не удалось получить информацию о токене",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_TO_MAIN_KB
             )
             return
         user_id = get_real_user_id(message)
@@ -600,34 +630,20 @@ async def show_sell_menu(message: types.Message, state: FSMContext, session: Asy
 
         keyboard = get_sell_keyboard_list(slippage, last_buy_amount, sell_percentage, gas_fee)
 
-        message_text = (
-            f"${token_info.symbol} 📈 - {token_info.name}\n\n"
-            f"📍 Адрес токена:\n`{token_address}`\n\n"
-            f"💰 Баланс: {_format_price(token_balance)} токенов (${_format_price(token_balance * token_info.price_usd)})\n"
-            f"⚙️ Slippage: {slippage}%\n\n"
-            f"📊 Информация о токене:\n"
-            f"• Price: ${_format_price(token_info.price_usd)}\n"
-            f"• MC: ${_format_price(token_info.market_cap)}\n"
-            f"• Renounced: {'✅️' if token_info.is_renounced else '✗'} "
-            f"Burnt: {'✅️' if token_info.is_burnt else '✗'}\n\n"
-            f"🔍 Анализ: [Pump](https://www.pump.fun/{token_address})"
-        )
+        message_text = banner + _render_sell_menu_text(token_info, token_address, token_balance, slippage)
 
-        await message.edit_text(
+        await send(
             message_text,
             reply_markup=keyboard,
             parse_mode="MARKDOWN",
             disable_web_page_preview=True
         )
 
-    except Exception as e:
-        logger.error(f"Error showing sell menu: {e}")
-        traceback.print_exc()
-        await message.edit_text(
+    except Exception:
+        logger.exception("Error showing sell menu")
+        await send(
             "❌ Произошла ошибка при отображении меню",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-            ])
+            reply_markup=_BACK_TO_MAIN_KB
         )
 
 
@@ -635,20 +651,19 @@ async def show_sell_menu(message: types.Message, state: FSMContext, session: Asy
 async def handle_custom_slippage(message: types.Message, state: FSMContext, session: AsyncSession):
     """Handle custom slippage input"""
     try:
-        slippage = float(message.text.replace(",", "."))
+        slippage = parse_number(message.text)
         if slippage <= 0 or slippage > 100:
             raise ValueError("Invalid slippage value")
         user_id = get_real_user_id(message)
-        sell_setting = await get_user_setting(user_id, 'sell', session)
-        sell_setting['slippage'] = slippage
-        await update_user_setting(user_id, 'sell', sell_setting, session)
+        await patch_user_setting(user_id, 'sell', 'slippage', slippage, session)
         await state.update_data(slippage=slippage)
 
-        # Отправляем новое сообщение об успешном изменении
-        status_message = await message.answer(f"✅ Slippage установлен: {slippage}%")
-
-        # Показываем обновленное меню продажи
-        await show_sell_menu(status_message, state, session)
+        # Подтверждение выводим в том же сообщении, что и обновленное меню продажи
+        await show_sell_menu(
+            message, state, session,
+            banner=f"✅ Slippage установлен: {slippage}%\n\n",
+            new_message=True
+        )
 
     except ValueError:
         await message.reply(
@@ -661,16 +676,17 @@ async def handle_custom_slippage(message: types.Message, state: FSMContext, sess
 async def handle_custom_percentage(message: types.Message, state: FSMContext, session: AsyncSession):
     """Handle custom percentage input"""
     try:
-        sell_percentage = float(message.text.replace("%", ""))
+        sell_percentage = parse_number(message.text)
         if sell_percentage < 1 or sell_percentage > 100:
             raise ValueError("Invalid percentage value")
         await state.update_data(sell_percentage=sell_percentage)
 
-        # Отправляем новое сообщение об успешном изменении
-        status_message = await message.answer(f"✅ Процент установлен: {sell_percentage}%")
-
-        # Показываем обновленное меню продажи
-        await show_sell_menu(status_message, state, session)
+        # Подтверждение выводим в том же сообщении, что и обновленное меню продажи
+        await show_sell_menu(
+            message, state, session,
+            banner=f"✅ Процент установлен: {sell_percentage}%\n\n",
+            new_message=True
+        )
 
     except ValueError:
         await message.reply(
@@ -685,75 +701,69 @@ def get_sell_keyboard_list(
         sell_percentage: float | str,
         gas_fee: float
 ):
-    first_row = [[
-        InlineKeyboardButton(text="🔴 Продать", callback_data="market_sell"),
-        InlineKeyboardButton(text="📊 Лимитный", callback_data="limit_sell")
-    ]]
+    # Процент может прийти строкой из FSM, приводим к одному виду для ключа кэша
+    if isinstance(sell_percentage, str) and sell_percentage != "initial":
+        try:
+            sell_percentage = float(sell_percentage)
+        except ValueError:
+            pass
+    return _build_sell_keyboard(slippage, last_buy_amount, sell_percentage, gas_fee)
+
+
+@functools.lru_cache(maxsize=2048, typed=True)
+def _build_sell_keyboard(
+        slippage: float,
+        last_buy_amount: float,
+        sell_percentage: float | str,
+        gas_fee: float
+) -> InlineKeyboardMarkup:
+    """Клавиатура меню продажи; готовая разметка переиспользуется для одинаковых параметров"""
     last_row = [
         [InlineKeyboardButton(text=f"⚙️ Slippage: {slippage}%", callback_data="sell_set_slippage")],
-        [InlineKeyboardButton(text="💰 Продать", callback_data="confirm_sell")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
+        *_SELL_KB_TAIL_ROWS
     ]
 
-    values = [
-        25,
-        50,
-        75,
-        100,
+    # Кнопка с галочкой берётся только для выбранного процента
+    percent_buttons = [
+        _SELL_PERCENT_BUTTONS[val][sell_percentage == val] for val in _SELL_PERCENT_PRESETS
     ]
-    buttons = []
-    row = []
-    chosen = False
-    for i in range(len(values)):
-        val = values[i]
-        if i % 3 == 0:
-            buttons.append(row)
-            row = []
-        if sell_percentage == val:
-            chosen = True
-        row.append(
-            InlineKeyboardButton(
-                text=f"✅️ {val}%" if sell_percentage == val else f"{val}%",
-                callback_data=f"sell_{val}"
-            )
-        )
-    if row:
-        buttons.append(row)
-    if sell_percentage == 'initial':
-        chosen = True
-    buttons[-1].append(InlineKeyboardButton(
+    chosen = sell_percentage == 'initial' or sell_percentage in _SELL_PERCENT_BUTTONS
+    custom_button = InlineKeyboardButton(
         text=f"{'' if chosen else '✅️ ' + str(sell_percentage) + '%'} Custom",
-        callback_data="sell_custom"))
+        callback_data="sell_custom")
+    buttons = [
+        percent_buttons[:3],
+        percent_buttons[3:] + [custom_button]
+    ]
     if last_buy_amount:
         buttons.append([InlineKeyboardButton(
             text=f"Initial {'✅️' if sell_percentage == 'initial' else ''} {last_buy_amount} SOL ",
             callback_data=f"sell_initial"
         )])
     buttons.append([InlineKeyboardButton(
-        text=f"🚀 Gas Fee {': ' + _format_price(gas_fee / 1e9) + ' SOL' if gas_fee else ''}",
+        text=_gas_fee_button_text(gas_fee),
         callback_data=f"sell_set_gas_fee")])
-    return InlineKeyboardMarkup(inline_keyboard=first_row + buttons + last_row)
+    return InlineKeyboardMarkup(inline_keyboard=[_SELL_KB_FIRST_ROW] + buttons + last_row)
 
 @router.message(SellStates.waiting_for_gas_fee)
 async def handle_custom_gas_fee(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Handle custom slippage input"""
     try:
-        gas_fee = float(callback_query.text.replace(",", "."))
+        gas_fee = parse_number(callback_query.text)
         if gas_fee <= 0 or gas_fee > 10:
             raise ValueError("Invalid gas_fee value")
         gas_fee *= 1e9
         user_id = get_real_user_id(callback_query)
 
-        sell_setting = await get_user_setting(user_id, 'sell', session)
-        sell_setting['gas_fee'] = gas_fee
-        await update_user_setting(user_id, 'sell', sell_setting, session)
+        await patch_user_setting(user_id, 'sell', 'gas_fee', gas_fee, session)
         await state.update_data(gas_fee=gas_fee)
 
-        # Отправляем новое сообщение об успешном изменении
-        status_message = await callback_query.answer(f"✅ Gas Fee установлен: {_format_price(gas_fee / 1e9)} SOL")
-
-        # Показываем обновленное меню покупки
-        await show_sell_menu(status_message, state, session)
+        # Подтверждение выводим в том же сообщении, что и обновленное меню продажи
+        await show_sell_menu(
+            callback_query, state, session,
+            banner=f"✅ Gas Fee установлен: {_format_price(gas_fee / 1e9)} SOL\n\n",
+            new_message=True
+        )
 
     except ValueError as e:
         logger.error(f"[BUY] Invalid gas_fee value: {e}")
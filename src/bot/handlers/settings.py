@@ -1,214 +1,229 @@
-import traceback
-from pprint import pprint
-from typing import Union
+import asyncio
+import functools
 
-from aiogram import types
 from aiogram import Router, types, F
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import select
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ForceReply
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.bot.crud import get_user_settings, update_user_setting, get_user_setting, create_initial_user_settings
+from src.bot.crud import (get_user_settings_or_none, patch_user_setting,
+                          toggle_user_setting, create_initial_user_settings)
 import logging
 
 from src.bot.handlers.buy import _format_price
 from src.bot.states import BuySettingStates, SellSettingStates
-from src.bot.utils import get_real_user_id
-from src.database import User
+from src.bot.utils import get_real_user_id, try_parse_number
 
 router = Router()
 
 logger = logging.getLogger(__name__)
 
+# Статичные кнопки и клавиатуры создаём один раз при загрузке модуля
+_BACK_ROW = [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
+_ANTI_MEV_ON_ROW = [InlineKeyboardButton(text="🟢 Anti MEV", callback_data="edit_antimev")]
+_ANTI_MEV_OFF_ROW = [InlineKeyboardButton(text="🔴 Anti MEV", callback_data="edit_antimev")]
+_BACK_KB = InlineKeyboardMarkup(inline_keyboard=[_BACK_ROW])
+_BACK_TO_SETTINGS_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад", callback_data="settings_menu")]
+])
+
+_SETTINGS_MENU_TEXT = (
+    "⚙️ Настройки\n\n"
+    "Выберите настройку для изменения"
+)
+_BUY_GAS_FEE_TMPL = "🚀 Покупка: Gas fee ({price} SOL)"
+_BUY_SLIPPAGE_TMPL = "⚙️ Покупка: Slippage ({slippage}%)"
+_SELL_GAS_FEE_TMPL = "🚀 Продажа: Gas fee ({price} SOL)"
+_SELL_SLIPPAGE_TMPL = "⚙️ Продажа: Slippage ({slippage}%)"
+
+
+def _button(text: str, callback_data: str) -> InlineKeyboardButton:
+    """Кнопка из заведомо корректных значений, без валидации pydantic"""
+    return InlineKeyboardButton.model_construct(text=text, callback_data=callback_data)
+
+
+def _build_settings_keyboard(settings_dict: dict) -> InlineKeyboardMarkup:
+    """Клавиатура меню настроек; для одинаковых значений возвращается уже собранная"""
+    buy_settings = settings_dict.get('buy')
+    sell_settings = settings_dict.get('sell')
+    # typed=True не различает типы внутри кортежей: slippage передаём уже строкой,
+    # иначе 1 и 1.0 делили бы одну закэшированную клавиатуру ("1%" и "1.0%")
+    return _settings_keyboard(
+        (buy_settings['gas_fee'], str(buy_settings['slippage'])) if buy_settings else None,
+        (sell_settings['gas_fee'], str(sell_settings['slippage'])) if sell_settings else None,
+        bool(settings_dict.get('anti_mev', False))
+    )
 
-@router.callback_query(F.data == "settings_menu", flags={"priority": 3})
-async def show_settings_menu(update: Union[types.Message, types.CallbackQuery], session: AsyncSession):
-    """Отображение главного меню настроек с данными из базы"""
-    try:
-        # Определяем тип объекта и получаем нужные атрибуты
-        if isinstance(update, types.Message):
-            message = update
-            user_id = update.from_user.id
-        else:  # CallbackQuery
-            message = update.message
-            user_id = update.from_user.id
-
-        stmt = select(User).where(User.telegram_id == user_id)
-        result = await session.execute(stmt)
-        user = result.unique().scalar_one_or_none()
-
-        if not user:
-            logger.warning(f"No user found for ID {user_id}")
-            if isinstance(update, types.Message):
-                await message.reply(
-                    "❌ Кошелек не найден. Используйте /start для создания.",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                    ])
-                )
-            else:
-                await message.edit_text(
-                    "❌ Кошелек не найден. Используйте /start для создания.",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                    ])
-                )
-            return
 
-        settings_dict = await get_user_settings(user_id, session)
-        if not settings_dict:
-            await create_initial_user_settings(user_id, session)
-            settings_dict = await get_user_settings(user_id, session)
+@functools.lru_cache(maxsize=1024, typed=True)
+def _settings_keyboard(buy_settings: tuple | None, sell_settings: tuple | None, anti_mev: bool) -> InlineKeyboardMarkup:
+    button_rows = []
+    if buy_settings:
+        gas_fee, slippage = buy_settings
+        button_rows += [
+            [_button(_BUY_GAS_FEE_TMPL.format(price=_format_price(gas_fee / 1e9)), "edit_buy_gasfee")],
+            [_button(_BUY_SLIPPAGE_TMPL.format(slippage=slippage), "edit_buy_slippage")]
+        ]
+
+    if sell_settings:
+        gas_fee, slippage = sell_settings
+        button_rows += [
+            [_button(_SELL_GAS_FEE_TMPL.format(price=_format_price(gas_fee / 1e9)), "edit_sell_gasfee")],
+            [_button(_SELL_SLIPPAGE_TMPL.format(slippage=slippage), "edit_sell_slippage")]
+        ]
+
+    return InlineKeyboardMarkup(
+        inline_keyboard=
+        button_rows +  # Кнопки покупки и продажи
+        [
+            _ANTI_MEV_ON_ROW if anti_mev else _ANTI_MEV_OFF_ROW,
+            _BACK_ROW
+        ]
+    )
 
-        # Формируем текст меню
-        menu_text = (
-            "⚙️ Настройки\n\n"
-            "Выберите настройку для изменения"
-        )
-        buy_settings_keyboard = []
-        if 'buy' in settings_dict:
-            gas_fee = settings_dict['buy']['gas_fee'] / 1e9
-            buy_settings_keyboard = [
-                InlineKeyboardButton(
-                    text=f"🚀 Покупка: Gas fee ({_format_price(gas_fee)} SOL)",
-                    callback_data="edit_buy_gasfee"
-                ),
-                InlineKeyboardButton(
-                    text=f"⚙️ Покупка: Slippage ({settings_dict['buy']['slippage']}%)",
-                    callback_data="edit_buy_slippage"
-                )
-            ]
-
-        sell_settings_keyboard = []
-        if 'sell' in settings_dict:
-            gas_fee = settings_dict['sell']['gas_fee'] / 1e9
-            sell_settings_keyboard = [
-                InlineKeyboardButton(text=f"🚀 Продажа: Gas fee ({_format_price(gas_fee)} SOL)",
-                                     callback_data="edit_sell_gasfee"),
-                InlineKeyboardButton(text=f"⚙️ Продажа: Slippage ({settings_dict['sell']['slippage']}%)",
-                                     callback_data="edit_sell_slippage")
-            ]
-
-        # Создаем список кнопок, распределяя их по строкам
-        buttonRows = []
-        max_len = max(len(buy_settings_keyboard), len(sell_settings_keyboard))
-        # for i in range(max_len):
-        #     row = []
-        if len(buy_settings_keyboard):
-            buttonRows += buy_settings_keyboard
-        if len(sell_settings_keyboard):
-            buttonRows += sell_settings_keyboard
-        buttonRows = [[btn] for btn in buttonRows]
-        # buttonRows.append(row)
-
-        # Определение состояния Anti MEV
-        anti_mev_text = '🟢 Anti MEV' if settings_dict.get('anti_mev', False) else '🔴 Anti MEV'
-        anti_mev_button = InlineKeyboardButton(text=anti_mev_text, callback_data="edit_antimev")
-
-        # Формирование клавиатуры
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=
-            buttonRows +  # Добавляем кнопки покупки и продажи
-            [
-                [anti_mev_button],  # Кнопка Anti MEV
-                [
-                    InlineKeyboardButton(
-                        text="⬅️ Назад",
-                        callback_data="main_menu"
-                    )
-                ]
-            ]
+
+_USER_NOT_FOUND_TEXT = "❌ Кошелек не найден. Используйте /start для создания."
+_SETTINGS_MENU_ERROR_TEXT = "❌ Произошла ошибка при загрузке меню настроек"
+_SETTINGS_NOT_FOUND_TEXT = "❌ Настройки не найдены"
+
+
+async def _load_settings_dict(user_id: int, session: AsyncSession,
+                              settings_dict: dict | None = None) -> dict | None:
+    """Настройки пользователя из базы (None, если пользователя нет), при необходимости создаёт значения по умолчанию"""
+    # Пользователь и его настройки получаем одним запросом
+    if settings_dict is None:
+        settings_dict = await get_user_settings_or_none(user_id, session)
+
+    if settings_dict == {}:
+        # Созданные значения по умолчанию возвращаются сразу, без повторного запроса.
+        # Если их уже создал параллельный запрос, перечитываем настройки
+        settings_dict = (
+            await create_initial_user_settings(user_id, session)
+            or await get_user_settings_or_none(user_id, session)
+            or {}
         )
+    return settings_dict
 
-        # Отправляем или редактируем сообщение в зависимости от типа объекта
-        if isinstance(update, types.Message):
-            await message.answer(menu_text, reply_markup=keyboard)
-        else:  # CallbackQuery
-            await message.edit_text(menu_text, reply_markup=keyboard)
 
-    except Exception as e:
-        logger.error(f"Error showing settings menu: {e}")
-        traceback.print_exc()
-
-        if isinstance(update, types.Message):
-            await update.reply(
-                "❌ Произошла ошибка при загрузке меню настроек",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                ])
-            )
-        else:  # CallbackQuery
-            await update.message.edit_text(
-                "❌ Произошла ошибка при загрузке меню настроек",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                ])
-            )
+async def _compose_settings_view(user_id: int, session: AsyncSession,
+                                 settings_dict: dict | None = None) -> tuple[str, InlineKeyboardMarkup]:
+    """Текст и клавиатура меню настроек по данным из базы (или уже загруженным settings_dict)"""
+    settings_dict = await _load_settings_dict(user_id, session, settings_dict)
+    # Работа с базой закончена: commit завершает транзакцию и возвращает соединение в пул
+    # до запросов к Telegram. Сессией по-прежнему владеет DatabaseMiddleware
+    await session.commit()
+
+    if settings_dict is None:
+        logger.warning(f"No user found for ID {user_id}")
+        return _USER_NOT_FOUND_TEXT, _BACK_KB
+
+    return _SETTINGS_MENU_TEXT, _build_settings_keyboard(settings_dict)
+
+
+@router.callback_query(F.data == "settings_menu", flags={"priority": 3})
+async def show_settings_menu(callback_query: types.CallbackQuery, session: AsyncSession):
+    """Открытие меню настроек по кнопке"""
+    # Подтверждаем нажатие сразу, до запросов в базу
+    await callback_query.answer()
+    await _show_settings_menu_callback(callback_query, session)
 
 
-from aiogram.types import ForceReply
+async def _show_settings_menu_callback(callback_query: types.CallbackQuery, session: AsyncSession):
+    """Отображение меню настроек в сообщении с нажатой кнопкой"""
+    try:
+        menu_text, keyboard = await _compose_settings_view(callback_query.from_user.id, session)
+        await callback_query.message.edit_text(menu_text, reply_markup=keyboard)
+    except Exception:
+        logger.exception("Error showing settings menu")
+        await callback_query.message.edit_text(_SETTINGS_MENU_ERROR_TEXT, reply_markup=_BACK_KB)
 
 
-@router.callback_query(lambda c: c.data.startswith("edit_"))
+async def _show_settings_menu_message(message: types.Message, session: AsyncSession,
+                                      settings_dict: dict | None = None):
+    """Отображение меню настроек новым сообщением в ответ на ввод пользователя"""
+    try:
+        menu_text, keyboard = await _compose_settings_view(message.from_user.id, session, settings_dict)
+        await message.answer(menu_text, reply_markup=keyboard)
+    except Exception:
+        logger.exception("Error showing settings menu")
+        await message.reply(_SETTINGS_MENU_ERROR_TEXT, reply_markup=_BACK_KB)
+
+
+# callback_data -> (текст запроса значения, состояние ожидания ввода)
+_SLIPPAGE_PROMPT_TEXT = "Введите новое значение для ⚙️Slippage (например, 15):"
+_GAS_FEE_PROMPT_TEXT = "Введите новое значение для ⚙️Gas Fee (например, 0.001):"
+_EDIT_SETTING_ERROR_TEXT = "❌ Произошла ошибка при редактировании настройки"
+_EDIT_SETTING_PROMPTS = {
+    "edit_buy_slippage": (_SLIPPAGE_PROMPT_TEXT, BuySettingStates.waiting_for_slippage),
+    "edit_buy_gasfee": (_GAS_FEE_PROMPT_TEXT, BuySettingStates.waiting_for_gas_fee),
+    "edit_sell_slippage": (_SLIPPAGE_PROMPT_TEXT, SellSettingStates.waiting_for_slippage),
+    "edit_sell_gasfee": (_GAS_FEE_PROMPT_TEXT, SellSettingStates.waiting_for_gas_fee),
+}
+
+
+@router.callback_query(F.data.in_(_EDIT_SETTING_PROMPTS.keys() | {"edit_antimev"}))
 async def edit_setting(callback_query: types.CallbackQuery, state: FSMContext, session: AsyncSession):
     """Обработка редактирования настроек"""
+    await callback_query.answer()
     try:
-        params = callback_query.data.split("_")
-        setting_type = params[1]
-        attribute = params[2] if len(params) > 2 else None
-        user_id = get_real_user_id(callback_query)
-        example = ""
-        setting_name = ""
-
-        if attribute and setting_type in ('buy', 'sell'):
-            if attribute == 'slippage':
-                attribute = "Slippage"
-                example = "15"
-            elif attribute == 'gasfee':
-                attribute = "Gas Fee"
-                example = "0.001"
-            if setting_type == "buy":
-                setting_name = "Покупки"
-            else:
-                setting_name = "Продажи"
+        edit_prompt = _EDIT_SETTING_PROMPTS.get(callback_query.data)
 
+        if edit_prompt:
+            prompt_text, next_state = edit_prompt
             # Отправляем сообщение с ForceReply
             await callback_query.message.answer(
-                f"Введите новое значение для ⚙️{attribute} (например, {example}):",
+                prompt_text,
                 reply_markup=ForceReply(selective=True)  # ForceReply активирует режим ответа
             )
 
             # Устанавливаем состояние для ожидания ответа
-            if setting_type == "buy":
-                if attribute == "Slippage":
-                    await state.set_state(BuySettingStates.waiting_for_slippage)
-                    logger.info("BuySettingStates.waiting_for_slippage")
-                    return
-                elif attribute == "Gas Fee":
-                    await state.set_state(BuySettingStates.waiting_for_gas_fee)
-                    logger.info("BuySettingStates.waiting_for_gas_fee")
-                    return
-            else:
-                if attribute == "Slippage":
-                    await state.set_state(SellSettingStates.waiting_for_slippage)
-                    logger.info("SellSettingStates.waiting_for_slippage")
-                    return
-                elif attribute == "Gas Fee":
-                    await state.set_state(SellSettingStates.waiting_for_gas_fee)
-                    logger.info("SellSettingStates.waiting_for_gas_fee")
-                    return
-
-        elif setting_type == "antimev":
+            await state.set_state(next_state)
+            logger.debug("edit setting -> %s", next_state.state)
+            return
+
+        if callback_query.data == "edit_antimev":
             # Включить/выключить Anti MEV
-            current_value = await get_user_setting(user_id, "anti_mev", session)
-            new_value = not current_value
-            await update_user_setting(user_id, "anti_mev", new_value, session)
-            await show_settings_menu(callback_query, session)
+            user_id = get_real_user_id(callback_query)
+            anti_mev = await toggle_user_setting(user_id, "anti_mev", session)
+
+            # Текст меню не меняется - заменяем в текущей клавиатуре только строку Anti MEV
+            current_markup = callback_query.message.reply_markup
+            if not current_markup:
+                await _show_settings_menu_callback(callback_query, session)
+                return
+            anti_mev_row = _ANTI_MEV_ON_ROW if anti_mev else _ANTI_MEV_OFF_ROW
+            await callback_query.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                anti_mev_row if row and row[0].callback_data == "edit_antimev" else row
+                for row in current_markup.inline_keyboard
+            ]))
 
     except Exception as e:
         logger.error(f"Error editing setting: {e}")
-        await callback_query.answer("❌ Произошла ошибка при редактировании настройки")
+        await callback_query.message.answer(_EDIT_SETTING_ERROR_TEXT)
+
+
+# Описание редактируемых атрибутов настроек покупки/продажи
+_ATTRIBUTE_SPECS = {
+    "gas_fee": {
+        "type": float,
+        "name": "Gas Fee",
+        "unit": "",
+        "multiplier": 1e9,
+        "min": 0,
+        "max": 10,
+        "invalid_text": "❌ Пожалуйста, введите числовое значение для Gas Fee (0 - 10)"
+    },
+    "slippage": {
+        "type": float,
+        "name": "Slippage",
+        "unit": "%",
+        "multiplier": 1,
+        "min": 1.0,
+        "max": 100.0,
+        "invalid_text": "❌ Пожалуйста, введите числовое значение для Slippage (1.0 - 100.0)"
+    }
+}
 
 
 async def handle_custom_settings_edit_base(
@@ -216,126 +231,73 @@ async def handle_custom_settings_edit_base(
         message: types.Message, session: AsyncSession,
         state: FSMContext, retry_action
 ):
-    attribute_name_dict = {
-        "gas_fee": {
-            "type": float,
-            "name": "Gas Fee",
-            "unit": "",
-            "multiplier": 1e9,
-            "min": 0,
-            "max": 10
-
-        },
-        "slippage": {
-            "type": float,
-            "name": "Slippage",
-            "unit": "%",
-            "multiplier": 1,
-            "min": 1.0,
-            "max": 100.0
-        }
-    }
     attribute_name = attribute
     try:
         # Получаем пользователя и его настройки
         user_id = message.from_user.id
 
-        # Получаем текущие настройки
-        setting = await get_user_setting(user_id, setting_type, session)
-        if not setting \
-                or attribute not in setting \
-                or attribute not in attribute_name_dict:
-            await message.reply("❌ Настройки не найдены")
+        # Текущие настройки не читаем - patch_user_setting меняет ключ одним атомарным UPDATE
+        attribute_info = _ATTRIBUTE_SPECS.get(attribute)
+        if not attribute_info:
+            await message.reply(_SETTINGS_NOT_FOUND_TEXT)
             return
-        attribute_info = attribute_name_dict.get(attribute)
         # Получаем значение из сообщения
         value = message.text.strip()
         attribute_type = attribute_info.get('type')
         attribute_name = attribute_info.get('name')
         attribute_unit = attribute_info.get('unit')
         attribute_multiplier = attribute_info.get('multiplier')
-        # Проверяем, что введено число
-        try:
-            value = attribute_type(value)
-            if value > attribute_info.get('max') or value < attribute_info.get('min'):
-                raise ValueError
-        except ValueError:
+        # Проверяем, что введено число в допустимых пределах
+        number = try_parse_number(value)
+        if number is None \
+                or not attribute_info.get('min') <= (value := attribute_type(number)) <= attribute_info.get('max'):
             await message.reply(
-                f"❌ Пожалуйста, введите числовое значение для {attribute_name} "
-                + f"({attribute_info.get('min')} - {attribute_info.get('max')})",
+                attribute_info['invalid_text'],
                 reply_markup=ForceReply(selective=True))
             await state.set_state(retry_action)
             return
 
-        setting[attribute] = value * attribute_multiplier
-
-        # Сохраняем обновленные настройки
-        await update_user_setting(user_id, setting_type, setting, session)
+        # Сохраняем только изменённый ключ, не перезаписывая остальные поля настройки
+        await patch_user_setting(user_id, setting_type, attribute, value * attribute_multiplier, session)
 
-        # Отправляем подтверждение
-        await message.reply(f"✅ {attribute_name} установлено: {value}{attribute_unit}")
+        # Отправляем подтверждение и параллельно загружаем настройки для меню
+        _, settings_dict = await asyncio.gather(
+            message.reply(f"✅ {attribute_name} установлено: {value}{attribute_unit}"),
+            get_user_settings_or_none(user_id, session)
+        )
 
         # Показываем обновленное меню настроек
-        await show_settings_menu(message, session)
+        await _show_settings_menu_message(message, session, settings_dict)
 
-    except Exception as e:
-        logger.error(f"Error handling {setting_type} {attribute}: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception(f"Error handling {setting_type} {attribute}")
         await message.reply(
             f"❌ Произошла ошибка при установке {attribute_name}",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад", callback_data="settings_menu")]
-            ])
+            reply_markup=_BACK_TO_SETTINGS_KB
         )
 
 
-@router.message(BuySettingStates.waiting_for_gas_fee, flags={"priority": 5})
-async def handle_buy_gas_fee(message: types.Message, state: FSMContext, session: AsyncSession):
-    """Обработчик для установки значения Gas Fee"""
-    return await handle_custom_settings_edit_base(
-        setting_type="buy",
-        attribute="gas_fee",
-        message=message,
-        session=session,
-        state=state,
-        retry_action=BuySettingStates.waiting_for_gas_fee
-    )
-
-
-@router.message(BuySettingStates.waiting_for_slippage, flags={"priority": 5})
-async def handle_buy_slippage(message: types.Message, state: FSMContext, session: AsyncSession):
-    """Обработчик для установки значения Gas Fee"""
-    return await handle_custom_settings_edit_base(
-        setting_type="buy",
-        attribute="slippage",
-        message=message,
-        session=session,
-        state=state,
-        retry_action=BuySettingStates.waiting_for_slippage
-    )
-
-
-@router.message(SellSettingStates.waiting_for_gas_fee, flags={"priority": 5})
-async def handle_sell_gas_fee(message: types.Message, state: FSMContext, session: AsyncSession):
-    """Обработчик для установки значения Gas Fee"""
-    return await handle_custom_settings_edit_base(
-        setting_type="sell",
-        attribute="gas_fee",
-        message=message,
-        session=session,
-        state=state,
-        retry_action=SellSettingStates.waiting_for_gas_fee
-    )
+# Состояние ожидания ввода -> (тип настройки, атрибут)
+_EDIT_STATE_ARGS = {
+    BuySettingStates.waiting_for_gas_fee: ("buy", "gas_fee"),
+    BuySettingStates.waiting_for_slippage: ("buy", "slippage"),
+    SellSettingStates.waiting_for_gas_fee: ("sell", "gas_fee"),
+    SellSettingStates.waiting_for_slippage: ("sell", "slippage"),
+}
+_EDIT_STATES_BY_NAME = {edit_state.state: edit_state for edit_state in _EDIT_STATE_ARGS}
 
 
-@router.message(SellSettingStates.waiting_for_slippage, flags={"priority": 5})
-async def handle_sell_slippage(message: types.Message, state: FSMContext, session: AsyncSession):
-    """Обработчик для установки значения Gas Fee"""
+@router.message(StateFilter(*_EDIT_STATE_ARGS), flags={"priority": 5})
+async def handle_setting_value_input(message: types.Message, state: FSMContext, session: AsyncSession,
+                                     raw_state: str | None):
+    """Обработчик ввода нового значения Gas Fee / Slippage для покупки и продажи"""
+    edit_state = _EDIT_STATES_BY_NAME[raw_state]
+    setting_type, attribute = _EDIT_STATE_ARGS[edit_state]
     return await handle_custom_settings_edit_base(
-        setting_type="sell",
-        attribute="slippage",
+        setting_type=setting_type,
+        attribute=attribute,
         message=message,
         session=session,
         state=state,
-        retry_action=SellSettingStates.waiting_for_slippage
+        retry_action=edit_state
     )
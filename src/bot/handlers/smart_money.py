@@ -1,6 +1,8 @@
 # /path/to/handlers/smart_money_handlers.py
 
+import functools
 import logging
+import time
 from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -9,30 +11,50 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ForceReply
 import asyncio
 from aiogram import F
 
-from src.services.smart_money import SmartMoneyTracker, token_info  # Импортируем класс
+from src.services.smart_money import SmartMoneyTracker, token_info_cached
 from src.bot.states import SmartMoneyStates
 from src.bot.handlers.buy import _format_price
+from src.bot.utils import is_valid_token_address
 from solders.pubkey import Pubkey
 
 logger = logging.getLogger(__name__)
 
 router = Router()
-smart_money_tracker = SmartMoneyTracker()  # Создаём экземпляр класса
 
+# Статические клавиатуры создаются один раз при импорте
+_BACK_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
+])
+_BACK_TO_MAIN_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
+])
 
-def _is_valid_token_address(address: str) -> bool:
-    """Проверяет валидность адреса токена"""
-    try:
-        # Проверяем длину адреса
-        if len(address) != 44:
-            return False
 
-        # Проверяем, что адрес содержит только допустимые символы
-        valid_chars = set("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
-        return all(c in valid_chars for c in address)
+# Если анализ укладывается в это время, результат отправляется без промежуточного сообщения
+_STATUS_DELAY = 0.5
+_ANALYZING_TEXT = (
+    "🔍 Анализируем токен и получаем информацию о трейдерах...\n"
+    "Это может занять некоторое время"
+)
+
 
+async def _reply_status_if_slow(message: types.Message, task: asyncio.Future):
+    """Отправляет сообщение о начале анализа, только если задача не завершилась за _STATUS_DELAY"""
+    done, _ = await asyncio.wait({task}, timeout=_STATUS_DELAY)
+    if done:
+        return None
+    try:
+        return await message.reply(_ANALYZING_TEXT)
     except Exception:
-        return False
+        task.cancel()
+        raise
+
+
+async def _send_analysis_result(message: types.Message, status_message: types.Message | None, text: str, **kwargs):
+    """Заменяет сообщение о прогрессе результатом или отвечает сразу, если его не было"""
+    if status_message:
+        return await status_message.edit_text(text, **kwargs)
+    return await message.reply(text, **kwargs)
 
 
 # Хендлер для нажатия кнопки "Smart Money"
@@ -55,7 +77,7 @@ async def on_smart_money_button(callback_query: types.CallbackQuery, state: FSMC
 
 # Хендлер для команды /smart
 @router.message(Command("smart"), flags={"priority": 5})
-async def handle_smart_money_command(message: types.Message):
+async def handle_smart_money_command(message: types.Message, smart_money_tracker: SmartMoneyTracker):
     """Обработчик команды для Smart Money анализа"""
     try:
         # Получаем адрес токена из команды
@@ -71,40 +93,38 @@ async def handle_smart_money_command(message: types.Message):
         token_address = parts[1]
 
         # Проверяем валидность адреса
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             await message.reply(
                 "❌ Неверный адрес токена\n"
                 "Пожалуйста, проверьте адрес и попробуйте снова"
             )
             return
 
-        # Отправляем сообщение о начале анализа
-        status_message = await message.reply(
-            "🔍 Анализируем токен и получаем информацию о трейдерах...\n"
-            "Это может занять некоторое время"
-        )
+        # Анализируем токен через SmartMoneyTracker
+        analysis = asyncio.ensure_future(asyncio.wait_for(
+            _shared_analysis(smart_money_tracker, token_address),
+            timeout=60  # 60 секунд таймаут
+        ))
+        # Сообщение о начале анализа нужно только для долгих запросов
+        status_message = await _reply_status_if_slow(message, analysis)
 
         try:
-            # Анализируем токен через SmartMoneyTracker
-            metadata, traders = await asyncio.wait_for(
-                smart_money_tracker.analyze_accounts(token_address),
-                timeout=60  # 60 секунд таймаут
-            )
+            metadata, traders = await analysis
 
             # Форматируем результат
             result_message = format_smart_money_message(metadata, traders)
 
-            await status_message.edit_text(
+            await _send_analysis_result(
+                message, status_message,
                 result_message,
                 parse_mode="MARKDOWN",
                 disable_web_page_preview=True,
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_TO_MAIN_KB
             )
 
         except asyncio.TimeoutError:
-            await status_message.edit_text(
+            await _send_analysis_result(
+                message, status_message,
                 "❌ Превышено время ожидания при анализе токена\n"
                 "Попробуйте позже"
             )
@@ -118,47 +138,96 @@ async def handle_smart_money_command(message: types.Message):
         )
 
 
+# Не больше стольких анализов разных токенов одновременно, остальные ждут в очереди
+_MAX_CONCURRENT_ANALYSES = 8
+_analysis_semaphore = asyncio.BoundedSemaphore(_MAX_CONCURRENT_ANALYSES)
+
+
+async def _analyze_token(smart_money_tracker: SmartMoneyTracker, token_address: str):
+    """Крупнейшие трейдеры и информация о токене для Smart Money анализа"""
+    async with _analysis_semaphore:
+        # Запросы независимы - выполняем их параллельно
+        traders, metadata = await asyncio.gather(
+            smart_money_tracker.analyze_accounts(Pubkey.from_string(token_address)),
+            token_info_cached(token_address)
+        )
+    logger.debug("Smart money traders for %s: %s", token_address, traders)
+    return metadata, traders
+
+
+# Выполняющиеся анализы токенов: адрес -> Task
+_analysis_inflight: dict[str, asyncio.Task] = {}
+# Готовые результаты анализа: адрес -> (время получения, (metadata, traders))
+ANALYSIS_CACHE_TTL = 30
+_analysis_results: dict[str, tuple[float, tuple]] = {}
+
+
+def _on_analysis_done(token_address: str, task: asyncio.Task):
+    """Снимает анализ с учёта выполняющихся и кэширует непустой результат"""
+    _analysis_inflight.pop(token_address, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    metadata, traders = task.result()
+    if not metadata or not traders:
+        return
+
+    now = time.monotonic()
+    if len(_analysis_results) >= 1000:
+        # Удаляем устаревшие записи, чтобы словарь не рос бесконечно
+        for address in [a for a, (t, _) in _analysis_results.items() if now - t >= ANALYSIS_CACHE_TTL]:
+            del _analysis_results[address]
+    _analysis_results[token_address] = (now, (metadata, traders))
+
+
+async def _shared_analysis(smart_money_tracker: SmartMoneyTracker, token_address: str):
+    """Анализ токена; параллельные и повторные в пределах ANALYSIS_CACHE_TTL запросы получают общий результат"""
+    cached = _analysis_results.get(token_address)
+    if cached and time.monotonic() - cached[0] < ANALYSIS_CACHE_TTL:
+        return cached[1]
+
+    task = _analysis_inflight.get(token_address)
+    if task is None:
+        task = asyncio.ensure_future(_analyze_token(smart_money_tracker, token_address))
+        _analysis_inflight[token_address] = task
+        task.add_done_callback(functools.partial(_on_analysis_done, token_address))
+    # shield - отмена или таймаут одного ожидающего не прерывает анализ для остальных
+    return await asyncio.shield(task)
+
+
 # Хендлер для ввода адреса токена
 @router.message(SmartMoneyStates.waiting_for_token)
-async def handle_token_address_input(message: types.Message, state: FSMContext):
+async def handle_token_address_input(message: types.Message, state: FSMContext,
+                                     smart_money_tracker: SmartMoneyTracker):
     """Обработчик ввода адреса токена для Smart Money анализа"""
     try:
         token_address = message.text.strip()
 
         # Проверяем валидность адреса
-        if not _is_valid_token_address(token_address):
+        if not is_valid_token_address(token_address):
             await message.reply(
                 "❌ Неверный адрес токена\n"
                 "Пожалуйста, отправьте корректный адрес токена или нажмите Назад для возврата в меню",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-                ])
+                reply_markup=_BACK_KB
             )
             return
 
         # Сбрасываем состояние
         await state.clear()
 
-        # Отправляем сообщение о начале анализа
-        status_message = await message.reply(
-            "🔍 Анализируем токен и получаем информацию о трейдерах...\n"
-            "Это может занять некоторое время"
-        )
-
         # Анализируем токен через SmartMoneyTracker
-        traders = await smart_money_tracker.analyze_accounts(Pubkey.from_string(token_address))
-        print(f"Traders: {traders}")
-        metadata = token_info(token_address)
+        analysis = asyncio.ensure_future(_shared_analysis(smart_money_tracker, token_address))
+        # Сообщение о начале анализа нужно только для долгих запросов
+        status_message = await _reply_status_if_slow(message, analysis)
+        metadata, traders = await analysis
         result_message = format_smart_money_message(metadata, traders)
 
         # Отправляем результат
-        await status_message.edit_text(
+        await _send_analysis_result(
+            message, status_message,
             result_message,
             parse_mode="MARKDOWN",
             disable_web_page_preview=True,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="main_menu")]
-            ])
+            reply_markup=_BACK_TO_MAIN_KB
         )
 
     except Exception as e:
@@ -170,18 +239,49 @@ async def handle_token_address_input(message: types.Message, state: FSMContext):
         await state.clear()
 
 
+# Шаблон строки трейдера разбирается один раз при загрузке модуля
+_TRADER_TMPL = (
+    "  - 📜 Адрес: `{address}`\n"
+    "    🔹 Баланс: {balance} USD\n"
+    "    🔹 Средний ROI: {roi}%\n\n"
+)
+_NO_TRADERS_TEXT = "🧑‍💼 Нет данных о трейдерах с положительным ROI"
+
+
 def format_smart_money_message(metadata, traders):
     """Форматируем сообщение с результатами анализа"""
+    # Ответ API может прийти без части полей - не падаем на отсутствующих ключах
+    metadata = metadata or {}
+    base_token = metadata.get('baseToken') or {}
+    # Для одинаковых данных (в пределах TTL кэша token_info) возвращается уже собранный текст
+    return _render_smart_money_message(
+        (
+            metadata.get('baseTokenName') or base_token.get('name', 'Unknown Token'),
+            base_token.get('symbol', '???'),
+            metadata.get('priceUsd') or 0,
+            metadata.get('marketCap') or 0,
+        ),
+        tuple((trader['address'], trader['balance'], trader['roi']) for trader in traders)
+    )
+
+
+@functools.lru_cache(maxsize=2048, typed=True)
+def _render_smart_money_message(metadata: tuple, traders: tuple) -> str:
+    name, symbol, price, market_cap = metadata
     metadata_message = (
-        f"🔹 **Токен:** {metadata.get('baseTokenName')} ({metadata['baseToken'].get('symbol')})\n"
-        f"💰 **Цена:** {_format_price(metadata.get('priceUsd'))} USD\n"
-        f"📈 **Объём:** {_format_price(metadata.get('marketCap'))} USD\n\n"
+        f"🔹 **Токен:** {name} ({symbol})\n"
+        f"💰 **Цена:** {_format_price(price)} USD\n"
+        f"📈 **Объём:** {_format_price(market_cap)} USD\n\n"
     )
-    traders_message = "🧑‍💼 **Крупнейшие трейдеры:**\n\n"
-    for trader in traders:
-        traders_message += (
-            f"  - 📜 Адрес: `{trader['address']}`\n"
-            f"    🔹 Баланс: {_format_price(trader['balance'])} USD\n"
-            f"    🔹 Средний ROI: {_format_price(trader['roi'])}%\n\n"
+    if not traders:
+        return metadata_message + _NO_TRADERS_TEXT
+    # Собираем строки трейдеров одним join вместо конкатенации в цикле
+    traders_message = "".join(
+        _TRADER_TMPL.format(
+            address=address,
+            balance=_format_price(balance),
+            roi=_format_price(roi)
         )
-    return metadata_message + traders_message
\ No newline at end of file
+        for address, balance, roi in traders
+    )
+    return metadata_message + "🧑‍💼 **Крупнейшие трейдеры:**\n\n" + traders_message
@@ -1,3 +1,4 @@
+import asyncio
 import traceback
 
 import logging
@@ -12,11 +13,12 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram import F
 
-from src.bot.crud import create_initial_user_settings
+from src.bot.crud import create_initial_user_settings, invalidate_user_settings_cache
 
 from src.database.models import User
 from src.services.solana_service import SolanaService
 from src.bot.utils.user import get_real_user_id
+from src.solana_module.transaction_handler import invalidate_user_handler
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -78,19 +80,20 @@ async def show_main_menu(message: types.Message, session: AsyncSession, solana_s
         stmt = select(User).where(User.telegram_id == user_id)
         result = await session.execute(stmt)
         user = result.unique().scalar_one_or_none()
+        is_new_user = user is None
+        referrer = None
 
         # Если пользователь с таким ID уже существует
         if user:
-            # Обновляем время последней активности
+            # Обновляем время последней активности - сохранится одним коммитом
+            # вместе с настройками в create_initial_user_settings
             user.last_activity = datetime.now()
-            await session.commit()
         else:
             # Генерируем новый Solana-кошелек
             new_keypair = Keypair()
             private_key = list(bytes(new_keypair))  # Приватный ключ как список чисел
 
             # Поиск владельца реферального кода (если он передан)
-            referrer = None
             if referral_code:
                 referral_code = referral_code.replace("code_", "")
                 referrer_stmt = select(User).where(User.referral_code == referral_code)
@@ -109,7 +112,13 @@ async def show_main_menu(message: types.Message, session: AsyncSession, solana_s
                 last_activity=datetime.now()
             )
             session.add(user)
-            await session.commit()
+            # id нужен для настроек - пользователь и настройки сохраняются одним коммитом ниже
+            await session.flush()
+
+        # Создаём настройки пользователя (если нужно) и сохраняем изменения одной транзакцией
+        await create_initial_user_settings(user_id, session, user=user)
+
+        if is_new_user:
             # Отправляем сообщение владельцу реферала о новом пользователе
             if referrer:
                 try:
@@ -130,14 +139,13 @@ async def show_main_menu(message: types.Message, session: AsyncSession, solana_s
                 parse_mode="HTML"
             )
 
-        # Получаем баланс и цену SOL
-        balance = await solana_service.get_wallet_balance(user.solana_wallet)
-        sol_price = await solana_service.get_sol_price()
+        # Получаем баланс и цену SOL параллельно (оба метода сами обрабатывают ошибки)
+        balance, sol_price = await asyncio.gather(
+            solana_service.get_wallet_balance(user.solana_wallet),
+            solana_service.get_sol_price()
+        )
         usd_balance = balance * sol_price
 
-        # Создаём настройки пользователя (если нужно)
-        await create_initial_user_settings(user_id, session)
-
         # Отправляем главное меню
         from src.bot.handlers.buy import _format_price
         await message.answer(
@@ -176,6 +184,8 @@ async def reset_user_data(message: types.Message, session: AsyncSession):
             # Delete the user
             await session.delete(user)
             await session.commit()
+            invalidate_user_handler(user_id)
+            invalidate_user_settings_cache(user_id)
 
             await message.answer(
                 "🗑 Ваши данные успешно удалены из базы данных.\n"
@@ -212,9 +222,11 @@ async def back_to_main_menu(callback_query: types.CallbackQuery, session: AsyncS
             await callback_query.answer("❌ Пользователь не найден")
             return
 
-        # Get wallet balance and SOL price
-        balance = await solana_service.get_wallet_balance(user.solana_wallet)
-        sol_price = await solana_service.get_sol_price()
+        # Get wallet balance and SOL price concurrently
+        balance, sol_price = await asyncio.gather(
+            solana_service.get_wallet_balance(user.solana_wallet),
+            solana_service.get_sol_price()
+        )
         usd_balance = balance * sol_price
         from src.bot.handlers.buy import _format_price
         await callback_query.message.edit_text(
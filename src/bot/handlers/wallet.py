@@ -21,6 +21,7 @@ from solders.keypair import Keypair
 from .buy import _format_price
 from .start import get_real_user_id
 from src.bot.states import WalletStates
+from src.solana_module.transaction_handler import invalidate_user_handler
 
 logger = logging.getLogger(__name__)
 
@@ -41,19 +42,6 @@ async def on_wallet_menu_button(callback_query: types.CallbackQuery, session: As
         result = await session.execute(stmt)
         user = result.unique().scalar_one_or_none()
 
-        if not user:
-            # Also check the alternative ID format
-            alt_id = int(str(user_id).replace("bot", ""))
-            stmt = select(User).where(User.telegram_id == alt_id)
-            result = await session.execute(stmt)
-            user = result.unique().scalar_one_or_none()
-
-            if user:
-                # Update the ID to the current one
-                logger.info(f"Updating user ID from {user.telegram_id} to {user_id}")
-                user.telegram_id = user_id
-                await session.commit()
-
         if not user:
             logger.warning(f"No user found for ID {user_id}")
             await callback_query.message.edit_text(
@@ -265,6 +253,7 @@ async def handle_private_key_input(message: types.Message, state: FSMContext, se
             logger.info(f"[WALLET] User wallet updated to: {public_key}")
 
         await session.commit()
+        invalidate_user_handler(user_id)
         logger.info("[WALLET] Database changes committed successfully")
 
         # Delete the message containing the private key for security
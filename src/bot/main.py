@@ -9,13 +9,16 @@ from sqlalchemy.orm import sessionmaker
 from src.utils.config import Config
 from src.utils.logger import setup_logging
 from src.database.models import Base
+from src.database.database import ENGINE_OPTIONS
 from src.services.solana_service import SolanaService
 from src.services.smart_money import SmartMoneyTracker
 from src.services.rugcheck import RugCheckService
-from .middleware import DatabaseMiddleware, ServicesMiddleware
+from .middleware import DatabaseMiddleware, ServicesMiddleware, UserMiddleware, CallbackThrottlingMiddleware
 from .handlers import start, wallet, smart_money, help, buy, rugcheck, copy_trade, sell, settings, referral_system, withdraw
 from .services.copy_trade_service import CopyTradeService
 from src.solana_module.limit_orders import AsyncLimitOrders
+from src.solana_module.solana_client import SolanaClient
+from src.solana_module.transaction_handler import close_user_handlers
 
 logger = setup_logging()
 
@@ -40,15 +43,7 @@ class SolanaDEXBot:
             self.limit_orders_service = None  # Will be initialized after DB setup
 
             # Setup database
-            self.engine = create_async_engine(
-                Config.DATABASE_URL,
-                pool_size=99999,
-                max_overflow=10000,
-                pool_timeout=30,
-                pool_pre_ping=True,
-                pool_recycle=30,
-                echo=False
-            )
+            self.engine = create_async_engine(Config.DATABASE_URL, **ENGINE_OPTIONS)
 
             # Create async session factory
             self.Session = sessionmaker(
@@ -58,9 +53,15 @@ class SolanaDEXBot:
             )
 
             # Register middlewares
+            # Duplicate sell and anti-MEV toggle clicks are dropped before a DB session is even opened
+            self.dp.callback_query.middleware(CallbackThrottlingMiddleware())
             self.dp.message.middleware(DatabaseMiddleware(self.Session))
             self.dp.callback_query.middleware(DatabaseMiddleware(self.Session))
 
+            # Пользователь загружается после сессии, один раз на апдейт
+            self.dp.message.middleware(UserMiddleware())
+            self.dp.callback_query.middleware(UserMiddleware())
+
             self.dp.message.middleware(ServicesMiddleware(
                 self.solana_service,
                 self.smart_money_tracker,
@@ -116,6 +117,10 @@ class SolanaDEXBot:
                 self.limit_orders_service.monitor_prices(interval=15)
             )
 
+            # Keep a fresh blockhash cached so transactions don't wait for it
+            self.blockhash_client = SolanaClient(compute_unit_price=0)
+            self.blockhash_task = asyncio.create_task(self.blockhash_client.start_blockhash_updater())
+
             # Start copy trade service
             logger.info("Starting copy trade service...")
             async with self.Session() as session:
@@ -127,20 +132,28 @@ class SolanaDEXBot:
             logger.error(f"Bot polling error: {e}")
         finally:
             # Cleanup
+            if hasattr(self, 'blockhash_task'):
+                self.blockhash_task.cancel()
+                try:
+                    await self.blockhash_task
+                except asyncio.CancelledError:
+                    pass
+            if hasattr(self, 'blockhash_client'):
+                await self.blockhash_client.client.close()
             if hasattr(self, 'limit_orders_service'):
                 await self.limit_orders_service.close()
             if hasattr(self, 'copy_trade_service'):
                 await self.copy_trade_service.stop()
             if hasattr(self, 'rugcheck_service'):
                 await self.rugcheck_service.close()
+            if hasattr(self, 'smart_money_tracker'):
+                await self.smart_money_tracker.close()
+            if hasattr(self, 'solana_service'):
+                await self.solana_service.close()
+            await close_user_handlers()
             if hasattr(self, 'engine'):
                 await self.engine.dispose()
 
-            # Close all RPC clients
-            # if hasattr(self, 'smart_money_tracker'):
-            #     for client in self.smart_money_tracker.rpc_clients:
-            #         await client.close()
-
 
 async def main():
     """Main async entry point"""
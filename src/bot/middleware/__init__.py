@@ -1,4 +1,6 @@
 from .database import DatabaseMiddleware
 from .services import ServicesMiddleware
+from .throttling import CallbackThrottlingMiddleware
+from .user import UserMiddleware
 
-__all__ = ['DatabaseMiddleware', 'ServicesMiddleware'] 
\ No newline at end of file
+__all__ = ['DatabaseMiddleware', 'ServicesMiddleware', 'CallbackThrottlingMiddleware', 'UserMiddleware']
\ No newline at end of file
@@ -1,4 +1,3 @@
-import traceback
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
@@ -25,9 +24,8 @@ class DatabaseMiddleware(BaseMiddleware):
                 result = await handler(event, data)
                 await session.commit()
                 return result
-            except Exception as e:
-                traceback.print_exc()
-                logger.error(f"Error in database middleware: {e}")
+            except Exception:
+                logger.exception("Error in database middleware")
                 await session.rollback()
             finally:
                 await session.close()
\ No newline at end of file
@@ -0,0 +1,56 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackThrottlingMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторные одинаковые нажатия кнопок одного пользователя.
+
+    Пока callback (user_id, data) обрабатывается или прошло меньше `window` секунд
+    с его начала, дубликаты только подтверждаются через answer() без запуска хендлера.
+    """
+
+    def __init__(self, prefixes: Tuple[str, ...] = ("sell_", "confirm_sell", "edit_antimev"), window: float = 0.5):
+        self.prefixes = prefixes
+        self.window = window
+        self._in_flight = set()
+        self._last_started = {}
+        super().__init__()
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, CallbackQuery) or not event.data or not event.data.startswith(self.prefixes):
+            return await handler(event, data)
+
+        key = (event.from_user.id, event.data)
+        now = time.monotonic()
+        if key in self._in_flight or now - self._last_started.get(key, 0) < self.window:
+            logger.info(f"Backpressure: dropping duplicate callback {event.data} from user {key[0]}")
+            await event.answer()
+            return None
+
+        self._prune(now)
+        self._in_flight.add(key)
+        self._last_started[key] = now
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+
+    def _prune(self, now: float):
+        """Удаляет устаревшие отметки времени, чтобы словарь не рос бесконечно"""
+        if len(self._last_started) < 1000:
+            return
+        self._last_started = {
+            key: started for key, started in self._last_started.items()
+            if now - started < self.window or key in self._in_flight
+        }
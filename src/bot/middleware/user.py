@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import select
+import logging
+
+from ..utils.user import get_real_user_id
+from ...database.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserMiddleware(BaseMiddleware):
+    """Загружает пользователя один раз на апдейт и передаёт его в хендлер как `user`"""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        # Запрос делаем только для хендлеров, которые принимают аргумент `user`
+        handler_object = data.get("handler")
+        if handler_object is not None and "user" in handler_object.params and "user" not in data:
+            user_id = get_real_user_id(event)
+            stmt = (
+                select(User)
+                .where(User.telegram_id == user_id)
+                .limit(1)
+            )
+            result = await data["session"].execute(stmt)
+            data["user"] = result.scalar_one_or_none()
+
+        return await handler(event, data)
@@ -1,4 +1,7 @@
 from .user import get_real_user_id
 from .bot import create_inline_keyboard, create_button
+from .number import parse_number, try_parse_number
+from .address import is_valid_token_address
 
-__all__ = ['get_real_user_id', 'create_inline_keyboard', 'create_button']
\ No newline at end of file
+__all__ = ['get_real_user_id', 'create_inline_keyboard', 'create_button', 'parse_number', 'try_parse_number',
+           'is_valid_token_address']
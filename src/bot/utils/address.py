@@ -0,0 +1,9 @@
+import re
+
+# Адрес токена Solana - 32-44 символа base58 (без 0, O, I, l)
+_TOKEN_ADDRESS_RE = re.compile(r'[1-9A-HJ-NP-Za-km-z]{32,44}')
+
+
+def is_valid_token_address(address: str) -> bool:
+    """Проверяет валидность адреса токена"""
+    return _TOKEN_ADDRESS_RE.fullmatch(address) is not None
@@ -0,0 +1,23 @@
+import math
+import re
+
+# Число с точкой или запятой, допускается знак процента в конце: "1,5", "0.01", "50%"
+_NUMBER_RE = re.compile(r'^\s*(-?(?:\d+(?:[.,]\d*)?|[.,]\d+))\s*%?\s*$')
+
+
+def parse_number(text: str | None) -> float:
+    """Разбирает введённое пользователем число, ValueError если это не число"""
+    number = try_parse_number(text)
+    if number is None:
+        raise ValueError(f"Not a number: {text!r}")
+    return number
+
+
+def try_parse_number(text: str | None) -> float | None:
+    """То же, что parse_number, но возвращает None вместо исключения"""
+    match = _NUMBER_RE.match(text or "")
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", "."))
+    # Слишком длинная строка цифр превращается в inf
+    return number if math.isfinite(number) else None
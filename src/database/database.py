@@ -7,16 +7,23 @@ from src.utils.config import Config
 # Create base class for models
 Base = declarative_base()
 
-# Create async engine with PostgreSQL
-engine = create_async_engine(
-    Config.DATABASE_URL,
+# Connection pool settings shared by every engine of the bot
+ENGINE_OPTIONS = dict(
     echo=False,  # Disable SQL query logging in production
-    pool_size=99999,
-    max_overflow=10000,
+    pool_size=Config.DB_POOL_SIZE,  # Persistent connections kept open
+    max_overflow=Config.DB_MAX_OVERFLOW,  # Extra connections allowed during bursts
     pool_timeout=30,
-    pool_pre_ping=True,
-    pool_recycle=30
+    pool_pre_ping=True,  # Drop dead connections before handing them out
+    pool_recycle=3600,  # Reconnect hourly instead of every 30 seconds
 )
+if Config.DATABASE_URL.startswith('postgresql+asyncpg'):
+    ENGINE_OPTIONS['connect_args'] = {
+        'server_settings': {'application_name': 'dex-bot', 'jit': 'off'},
+        'command_timeout': 60,
+    }
+
+# Create async engine with PostgreSQL
+engine = create_async_engine(Config.DATABASE_URL, **ENGINE_OPTIONS)
 
 # Create session factory
 async_session = sessionmaker(
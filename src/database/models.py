@@ -1,6 +1,6 @@
 from enum import unique, Enum
 from sqlalchemy import Enum as SQLEnum, TypeDecorator, SmallInteger
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Text, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Text, BigInteger, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -58,7 +58,7 @@ class User(Base):
     last_buy_amount = Column(Float, nullable=True)
     referral_id = Column(Integer, ForeignKey('users.id'), index=True, nullable=True)
 
-    referred_users = relationship("User", back_populates="referrer", cascade="all, delete-orphan", lazy='joined')
+    referred_users = relationship("User", back_populates="referrer", cascade="all, delete-orphan")
     referrer = relationship("User", remote_side=[id], back_populates="referred_users")
 
     user_settings = relationship("UserSettings", back_populates="user")
@@ -256,6 +256,9 @@ class Setting(Base):
 
 class UserSettings(Base):
     __tablename__ = 'user_settings'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'setting_id', name='uq_user_settings_user_id_setting_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), index=True)
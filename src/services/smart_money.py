@@ -8,8 +8,11 @@ from solana.rpc.async_api import AsyncClient
 from solders.pubkey import Pubkey
 from tenacity import retry, stop_after_attempt, wait_exponential
 import requests
+import threading
 import time
 
+from src.utils.single_flight import SingleFlight
+
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
@@ -23,6 +26,31 @@ TARGET_MINT = "61V8vBaqAGMpgDQi4JcAwo1dmBGHsyhzodcPqnEVpump"
 
 # URL для запроса
 url = "https://api.coinmarketcap.com/dexer/v3/dexer/search/main-site"
+# HTTP-сессии переиспользуют соединения с API (keep-alive). requests.Session не потокобезопасна,
+# а token_info выполняется в потоках asyncio.to_thread, поэтому у каждого потока своя сессия
+_http_local = threading.local()
+_http_sessions = []
+_http_sessions_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _http_local.session = session
+        with _http_sessions_lock:
+            _http_sessions.append(session)
+    return session
+
+
+def close_http_sessions():
+    """Закрывает HTTP-сессии всех потоков"""
+    with _http_sessions_lock:
+        sessions = _http_sessions[:]
+        _http_sessions.clear()
+    for session in sessions:
+        session.close()
+
 
 # Параметры запроса
 def token_info(mint: str):
@@ -41,7 +69,7 @@ def token_info(mint: str):
 
     try:
         # Выполнение GET-запроса
-        response = requests.get(url, params=params, headers=headers)
+        response = _get_http_session().get(url, params=params, headers=headers, timeout=10)
         
         # Проверка успешности запроса
         if response.status_code == 200:
@@ -53,10 +81,46 @@ def token_info(mint: str):
     except requests.exceptions.RequestException as e:
         print(f"Произошла ошибка при выполнении запроса: {e}")
 
+
+# Кэш информации о токене: mint -> (время получения, данные)
+TOKEN_INFO_CACHE_TTL = 30
+_token_info_cache = {}
+# Параллельные запросы информации об одном токене выполняются одним запросом
+_token_info_flight = SingleFlight()
+
+
+async def token_info_cached(mint: str):
+    """token_info с кэшем на TOKEN_INFO_CACHE_TTL секунд и объединением параллельных запросов"""
+    mint = str(mint)
+    cached = _token_info_cache.get(mint)
+    if cached and time.monotonic() - cached[0] < TOKEN_INFO_CACHE_TTL:
+        return cached[1]
+
+    async def load():
+        # token_info - синхронный HTTP-запрос, выполняем его вне event loop
+        data = await asyncio.to_thread(token_info, mint)
+        # Ошибки запроса (None) не кэшируем
+        if data is not None:
+            now = time.monotonic()
+            if len(_token_info_cache) >= 1000:
+                # Удаляем устаревшие записи, чтобы словарь не рос бесконечно
+                for address in [a for a, (t, _) in _token_info_cache.items() if now - t >= TOKEN_INFO_CACHE_TTL]:
+                    del _token_info_cache[address]
+            _token_info_cache[mint] = (now, data)
+        return data
+
+    return await _token_info_flight.run(mint, load)
+
+
 class SmartMoneyTracker:
     def __init__(self):
         self.client = AsyncClient(RPC_URL)
 
+    async def close(self):
+        """Closes the RPC client shared by all analyses and the token info HTTP sessions."""
+        await self.client.close()
+        close_http_sessions()
+
     @retry(stop=stop_after_attempt(10), wait=wait_exponential(multiplier=1, min=2, max=10))
     async def fetch_transaction_with_retry(self, signature: str):
         """Fetch a transaction with retries."""
@@ -147,8 +211,12 @@ class SmartMoneyTracker:
         """Analyze largest accounts for the target mint."""
         accounts = []
         try:
-            largest_accounts = (await self.client.get_token_largest_accounts(target_mint)).value
-            ti = float(token_info(target_mint)['priceUsd'])
+            largest_accounts_resp, token_data = await asyncio.gather(
+                self.client.get_token_largest_accounts(target_mint),
+                token_info_cached(target_mint)
+            )
+            largest_accounts = largest_accounts_resp.value
+            ti = float(token_data['priceUsd'])
             for account in largest_accounts:
                 info = await self.account_info(account.address, target_mint, days_ago=days_ago)
                 if info:
@@ -158,7 +226,6 @@ class SmartMoneyTracker:
                         accounts.append({'address': account.address, 'balance': float(account.amount.ui_amount) * ti, 'transactions': tx_count, 'roi': avg_roi})
         except Exception as e:
             print(f"An error occurred: {e}")
-        self.client.close()
         return sorted(accounts, key=lambda x: x['roi'], reverse=True)
     
 
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+import time
 import traceback
 from datetime import datetime
 from typing import Optional
@@ -25,6 +27,25 @@ class SolanaService:
         self.sol_price = 0
         self.last_price_update = None
         self.price_update_interval = 300  # 5 minutes in seconds
+        self.price_retry_interval = 30  # Retry delay after a failed fetch, in seconds
+        self._price_expires_at = 0.0
+        self._price_lock = asyncio.Lock()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def _ensure_session(self):
+        """Creates the shared HTTP session on first use (it needs a running event loop)"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=30, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+
+    async def close(self):
+        """Closes the shared HTTP session and the RPC connection"""
+        if self.session:
+            await self.session.close()
+            self.session = None
+        await self.connection.close()
 
     def create_client(self, private_key: str) -> 'SolanaClient':
         """Create a new SolanaClient instance with the given private key"""
@@ -33,25 +54,34 @@ class SolanaService:
 
     async def get_sol_price(self) -> float:
         """Get current SOL price with caching"""
-        current_time = datetime.now()
-
         # Check if we need to update the price
-        if (self.last_price_update is None or
-                (current_time - self.last_price_update).total_seconds() > self.price_update_interval):
+        if time.monotonic() < self._price_expires_at:
+            return self.sol_price
+
+        async with self._price_lock:
+            # Another coroutine may have refreshed the price while we were waiting
+            if time.monotonic() < self._price_expires_at:
+                return self.sol_price
+
+            # While refreshing (and for a while after a failed refresh) the last known price is served
+            if self.sol_price:
+                self._price_expires_at = time.monotonic() + self.price_retry_interval
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                            'https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd') as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            self.sol_price = data['solana']['usd']
-                            self.last_price_update = current_time
-                        else:
-                            logger.error(f"Failed to fetch SOL price: {response.status}")
+                await self._ensure_session()
+                async with self.session.get(
+                        'https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd') as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        self.sol_price = data['solana']['usd']
+                        self.last_price_update = datetime.now()
+                        self._price_expires_at = time.monotonic() + self.price_update_interval
+                    else:
+                        logger.error(f"Failed to fetch SOL price: {response.status}")
             except Exception as e:
                 logger.error(f"Error fetching SOL price: {e}")
                 if self.sol_price == 0:  # If we don't have any cached price
                     self.sol_price = 100  # Use a default value
+                self._price_expires_at = time.monotonic() + self.price_retry_interval
 
         return self.sol_price
 
@@ -1,9 +1,11 @@
+import asyncio
 import logging
 import aiohttp
 from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 from src.solana_module.solana_analyzer import token_info
+from src.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -23,27 +25,36 @@ class TokenInfoService:
     def __init__(self):
         self.session = None
         self.cache = {}
-        self.cache_ttl = 300  # 5 минут
+        self.cache_ttl = 5  # цена и MC быстро устаревают
+        self.metadata_cache = {}
+        self.metadata_cache_ttl = 3600  # имя/символ почти не меняются
+        self.cache_max_size = 1000  # после этого размера устаревшие записи удаляются
+        self._inflight = SingleFlight()
 
     async def _ensure_session(self):
         if self.session is None:
             self.session = aiohttp.ClientSession()
 
     async def get_token_info(self, token_address: str) -> TokenInfo:
-        """Получает информацию о токене"""
-        try:
-            # Проверяем кэш
-            if token_address in self.cache:
-                cached_data, timestamp = self.cache[token_address]
-                if (datetime.now().timestamp() - timestamp) < self.cache_ttl:
-                    return cached_data
+        """Получает информацию о токене (с кэшем и объединением параллельных запросов)"""
+        # Проверяем кэш
+        if token_address in self.cache:
+            cached_data, timestamp = self.cache[token_address]
+            if (datetime.now().timestamp() - timestamp) < self.cache_ttl:
+                return cached_data
+
+        # Если запрос по этому токену уже выполняется - ждём его результат
+        return await self._inflight.run(token_address, lambda: self._fetch_token_info(token_address))
 
+    async def _fetch_token_info(self, token_address: str) -> TokenInfo:
+        """Запрашивает информацию о токене и обновляет кэш"""
+        try:
             await self._ensure_session()
 
             # Получаем данные с pump.fun
-
-            token_json = token_info(token_address)
-            print(token_json)
+            # token_info - синхронный HTTP-запрос, выполняем его вне event loop
+            token_json = await asyncio.to_thread(token_info, token_address)
+            logger.debug(f"Token info response for {token_address}: {token_json}")
             token_json_obj = TokenInfo(
                 name=token_json.get("baseToken", []).get("name", "Unknown Token"),
                 symbol=token_json.get("baseToken", []).get("symbol", "???"),
@@ -53,8 +64,11 @@ class TokenInfoService:
                 is_burnt=token_json.get("isBurnt", False),
                 address=token_address
             )
-            print(token_json_obj)
-            # self.cache[token_address] = (token_info, datetime.now().timestamp())
+            now = datetime.now().timestamp()
+            self._prune(self.cache, self.cache_ttl, now)
+            self._prune(self.metadata_cache, self.metadata_cache_ttl, now)
+            self.cache[token_address] = (token_json_obj, now)
+            self.metadata_cache[token_address] = (token_json_obj, now)
             return token_json_obj
 
             # async with self.session.get(f"https://api.pump.fun/token/{token_address}") as response:
@@ -81,7 +95,31 @@ class TokenInfoService:
 
         except Exception as e:
             logger.error(f"Error getting token info: {e}")
-            return self._get_default_token_info(token_address)
+            return self._get_cached_metadata(token_address) or self._get_default_token_info(token_address)
+
+    def _prune(self, cache: dict, ttl: float, now: float):
+        """Удаляет устаревшие записи, чтобы кэш по адресам от пользователей не рос бесконечно"""
+        if len(cache) < self.cache_max_size:
+            return
+        for address in [a for a, (_, timestamp) in cache.items() if now - timestamp >= ttl]:
+            del cache[address]
+
+    def _get_cached_metadata(self, token_address: str) -> Optional[TokenInfo]:
+        """Возвращает имя/символ токена из долгого кэша, если свежие данные получить не удалось"""
+        if token_address not in self.metadata_cache:
+            return None
+        cached_data, timestamp = self.metadata_cache[token_address]
+        if (datetime.now().timestamp() - timestamp) >= self.metadata_cache_ttl:
+            return None
+        return TokenInfo(
+            name=cached_data.name,
+            symbol=cached_data.symbol,
+            price_usd=0.0,
+            market_cap=0.0,
+            is_renounced=cached_data.is_renounced,
+            is_burnt=cached_data.is_burnt,
+            address=token_address
+        )
 
     def _get_default_token_info(self, token_address: str) -> TokenInfo:
         """Возвращает информацию по умолчанию, если не удалось получить данные"""
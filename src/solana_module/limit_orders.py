@@ -191,8 +191,8 @@ class AsyncLimitOrders:
                 active_orders = result.unique().scalars().all()
 
                 for order in active_orders:
-                    # Получаем текущую цену токена
-                    current_price = float(token_info(order.token_address)['priceUsd'])
+                    # Получаем текущую цену токена (синхронный HTTP-запрос выполняем вне event loop)
+                    current_price = float((await asyncio.to_thread(token_info, order.token_address))['priceUsd'])
                     if current_price is None:
                         continue
 
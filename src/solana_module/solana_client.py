@@ -58,6 +58,8 @@ load_dotenv()
 EXPECTED_DISCRIMINATOR = struct.pack("<Q", 6966180631402821399)
 TOKEN_DECIMALS = 6
 LAMPORTS_PER_SOL = 1_000_000_000
+BLOCKHASH_REFRESH_INTERVAL = 5  # секунд между фоновыми обновлениями blockhash
+BLOCKHASH_MAX_AGE = 30  # blockhash действителен ~60-90 секунд, берём с запасом
 url = "https://api.coinmarketcap.com/dexer/v3/dexer/search/main-site"
 
 
@@ -144,6 +146,9 @@ def is_rate_limit_error(exception):
 
 
 class SolanaClient:
+    # Общий для всех экземпляров кэш blockhash: (blockhash, time.monotonic() получения)
+    _cached_blockhash = None
+
     def __init__(self, compute_unit_price: int, private_key: Optional[str] = None):
         self.rpc_endpoint = os.getenv(f"SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
         api_key = os.getenv('API_KEY')
@@ -166,6 +171,28 @@ class SolanaClient:
         self.SYSTEM_RENT = Pubkey.from_string("SysvarRent111111111111111111111111111111111")
         self.SOL = Pubkey.from_string("So11111111111111111111111111111111111111112")
 
+    async def start_blockhash_updater(self, interval: float = BLOCKHASH_REFRESH_INTERVAL):
+        """Фоновая задача: периодически обновляет общий кэш blockhash."""
+        while True:
+            try:
+                await self.get_cached_blockhash(force_refresh=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to refresh cached blockhash: {e}")
+            await asyncio.sleep(interval)
+
+    async def get_cached_blockhash(self, force_refresh: bool = False):
+        """Возвращает blockhash из кэша, запрашивая новый только если кэш пуст или устарел."""
+        cached = SolanaClient._cached_blockhash
+        if not force_refresh and cached and time.monotonic() - cached[1] < BLOCKHASH_MAX_AGE:
+            return cached[0]
+
+        response = await send_request_with_rate_limit(self.client, self.client.get_latest_blockhash)
+        blockhash = response.value.blockhash
+        SolanaClient._cached_blockhash = (blockhash, time.monotonic())
+        return blockhash
+
     def load_keypair(self) -> Keypair:
         """
         Loads keypair from provided private key
@@ -218,7 +245,13 @@ class SolanaClient:
             logger.error(traceback.format_exc())
             raise
 
-    async def create_associated_token_account(self, mint: Pubkey) -> Pubkey:
+    def _compute_unit_price_ix(self, compute_unit_price: Optional[int] = None):
+        """Compute budget instruction; a per-call price overrides the client default."""
+        if compute_unit_price is None:
+            compute_unit_price = self.compute_unit_price
+        return set_compute_unit_price(int(compute_unit_price))
+
+    async def create_associated_token_account(self, mint: Pubkey, compute_unit_price: Optional[int] = None) -> Pubkey:
         """Creates associated token account for given mint if it doesn't exist."""
         associated_token_account = get_associated_token_address(self.payer.pubkey(), mint)
         account_info = await send_request_with_rate_limit(self.client, self.client.get_account_info,
@@ -230,10 +263,10 @@ class SolanaClient:
                 owner=self.payer.pubkey(),
                 mint=mint
             )
-            compute_budget_ix = set_compute_unit_price(int(self.compute_unit_price))
+            compute_budget_ix = self._compute_unit_price_ix(compute_unit_price)
             tx_ata = Transaction().add(create_ata_ix).add(compute_budget_ix)
-            tx_ata.recent_blockhash = (
-                await send_request_with_rate_limit(self.client, self.client.get_latest_blockhash)).value.blockhash
+            recent_blockhash = await self.get_cached_blockhash()
+            tx_ata.recent_blockhash = recent_blockhash
             tx_ata.fee_payer = self.payer.pubkey()
             tx_ata.sign(self.payer)
             try:
@@ -242,7 +275,9 @@ class SolanaClient:
                     self.client.send_transaction,
                     tx_ata,
                     self.payer,
-                    opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed)
+                    opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed),
+                    # Без явного blockhash send_transaction запросит новый и переподпишет транзакцию
+                    recent_blockhash=recent_blockhash
                 )
                 logger.info(f"ATA Transaction sent: https://explorer.solana.com/tx/{tx_ata_signature.value}")
                 await self.confirm_transaction_with_delay(tx_ata_signature.value)
@@ -261,7 +296,7 @@ class SolanaClient:
         stop=stop_after_attempt(5),
         reraise=True
     )
-    async def send_buy_transaction(self, params: dict, retries: int = 3):
+    async def send_buy_transaction(self, params: dict, retries: int = 3, compute_unit_price: Optional[int] = None):
         """
         Отправляет транзакцию покупки токенов.
         """
@@ -290,11 +325,12 @@ class SolanaClient:
                 data = discriminator + token_amount_packed + max_amount_packed
 
                 buy_ix = Instruction(self.PUMP_PROGRAM, data, accounts)
-                compute_budget_ix = set_compute_unit_price(int(self.compute_unit_price))
+                compute_budget_ix = self._compute_unit_price_ix(compute_unit_price)
 
                 tx_buy = Transaction().add(buy_ix).add(compute_budget_ix)
-                tx_buy.recent_blockhash = (
-                    await send_request_with_rate_limit(self.client, self.client.get_latest_blockhash)).value.blockhash
+                # При повторной попытке берём свежий blockhash
+                recent_blockhash = await self.get_cached_blockhash(force_refresh=attempt > 0)
+                tx_buy.recent_blockhash = recent_blockhash
                 tx_buy.fee_payer = self.payer.pubkey()
                 tx_buy.sign(self.payer)
 
@@ -303,7 +339,8 @@ class SolanaClient:
                     self.client.send_transaction,
                     tx_buy,
                     self.payer,
-                    opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed)
+                    opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed),
+                    recent_blockhash=recent_blockhash
                 )
 
                 logger.info(f"Buy Transaction sent: https://explorer.solana.com/tx/{tx_buy_signature.value}")
@@ -366,10 +403,10 @@ class SolanaClient:
         raise Exception(f"Transaction confirmation timeout after {max_retries} attempts")
 
     async def buy_token(self, mint: Pubkey, bonding_curve: Pubkey, associated_bonding_curve: Pubkey, amount: float,
-                        slippage: float = 0.25):
+                        slippage: float = 0.25, compute_unit_price: Optional[int] = None):
         """Executes token purchase."""
         try:
-            associated_token_account = await self.create_associated_token_account(mint)
+            associated_token_account = await self.create_associated_token_account(mint, compute_unit_price)
         except Exception as e:
             logger.error(f"Failed to create or verify associated token account: {e}")
             return
@@ -399,7 +436,7 @@ class SolanaClient:
         }
 
         try:
-            signature = await self.send_buy_transaction(params)
+            signature = await self.send_buy_transaction(params, compute_unit_price=compute_unit_price)
             return signature  # Return the transaction signature
         except RetryError as re:
             logger.error(f"Failed to execute Buy transaction after retries: {re}")
@@ -474,7 +511,7 @@ class SolanaClient:
         stop=stop_after_attempt(5),
         reraise=True
     )
-    async def send_sell_transaction(self, params: dict, retries: int = 3):
+    async def send_sell_transaction(self, params: dict, retries: int = 3, compute_unit_price: Optional[int] = None):
         """Sends sell transaction."""
         accounts = [
             AccountMeta(pubkey=self.PUMP_GLOBAL, is_signer=False, is_writable=False),
@@ -511,10 +548,11 @@ class SolanaClient:
                 data = discriminator + struct.pack("<Q", amount) + struct.pack("<Q", min_sol_output)
                 sell_ix = Instruction(self.PUMP_PROGRAM, data, accounts)
 
-                recent_blockhash = await self.client.get_latest_blockhash()
+                # При повторной попытке берём свежий blockhash
+                recent_blockhash = await self.get_cached_blockhash(force_refresh=attempt > 0)
                 transaction = Transaction()
-                transaction.add(sell_ix).add(set_compute_unit_price(int(self.compute_unit_price)))
-                transaction.recent_blockhash = recent_blockhash.value.blockhash
+                transaction.add(sell_ix).add(self._compute_unit_price_ix(compute_unit_price))
+                transaction.recent_blockhash = recent_blockhash
                 transaction.fee_payer = self.payer.pubkey()
                 transaction.sign(self.payer)
 
@@ -522,6 +560,7 @@ class SolanaClient:
                     transaction,
                     self.payer,
                     opts=TxOpts(skip_preflight=True, preflight_commitment=Confirmed),
+                    recent_blockhash=recent_blockhash
                 )
 
                 logger.info(f"Transaction sent: https://explorer.solana.com/tx/{tx_sell_signature.value}")
@@ -546,10 +585,10 @@ class SolanaClient:
         raise Exception("Failed to send transaction after all attempts")
 
     async def sell_token(self, mint: Pubkey, bonding_curve: Pubkey, associated_bonding_curve: Pubkey,
-                         token_amount: float, min_amount: float = 0.25):
+                         token_amount: float, min_amount: float = 0.25, compute_unit_price: Optional[int] = None):
         """Executes token sale."""
         try:
-            associated_token_account = await self.create_associated_token_account(mint)
+            associated_token_account = await self.create_associated_token_account(mint, compute_unit_price)
         except Exception as e:
             logger.error(f"Failed to create or verify associated token account: {e}")
             return
@@ -566,7 +605,7 @@ class SolanaClient:
         }
 
         try:
-            return await self.send_sell_transaction(params)
+            return await self.send_sell_transaction(params, compute_unit_price=compute_unit_price)
         except RetryError as re:
             logger.error(f"Failed to execute Sell transaction after retries: {re}")
         except Exception as e:
@@ -850,8 +889,8 @@ class SolanaClient:
                 transaction.add(transfer_ix)
 
             # Fetch recent blockhash and prepare transaction
-            recent_blockhash = await send_request_with_rate_limit(self.client, self.client.get_latest_blockhash)
-            transaction.recent_blockhash = recent_blockhash.value.blockhash
+            recent_blockhash = await self.get_cached_blockhash()
+            transaction.recent_blockhash = recent_blockhash
             transaction.fee_payer = payer.pubkey()
             transaction.sign(payer)
 
@@ -861,7 +900,8 @@ class SolanaClient:
                 self.client.send_transaction,
                 transaction,
                 payer,
-                opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed)
+                opts=TxOpts(skip_preflight=False, preflight_commitment=Confirmed),
+                recent_blockhash=recent_blockhash
             )
             logger.info(f"Transaction sent: https://explorer.solana.com/tx/{tx_signature.value}")
 
@@ -876,6 +916,12 @@ class SolanaClient:
             return None
 
     async def token_info(self, mint: str):
+        # requests блокирует поток - выполняем запрос вне event loop, чтобы поиск
+        # информации о токенах шёл параллельно и не останавливал остальные хендлеры
+        return await asyncio.to_thread(self._token_info_sync, mint)
+
+    @staticmethod
+    def _token_info_sync(mint: str):
         params = {
             "keyword": mint,
             "all": "false"
@@ -891,7 +937,7 @@ class SolanaClient:
 
         try:
             # Выполнение GET-запроса
-            response = requests.get(url, params=params, headers=headers)
+            response = requests.get(url, params=params, headers=headers, timeout=10)
 
             # Проверка успешности запроса
             if response.status_code == 200:
@@ -903,49 +949,45 @@ class SolanaClient:
         except requests.exceptions.RequestException as e:
             print(f"Произошла ошибка при выполнении запроса: {e}")
 
-    async def get_tokens(self, wallet_address: str, tx_handler=None) -> list:
-        """Оптимизированный метод получения токенов кошелька."""
-        token_accounts = await self.get_account_tokens(Pubkey.from_string(wallet_address))
+    async def get_token_balances(self, wallet_address: str) -> Dict[str, float]:
+        """Получает ненулевые балансы всех SPL токенов кошелька одним RPC запросом."""
+        response = await self.client.get_token_accounts_by_owner_json_parsed(
+            Pubkey.from_string(wallet_address),
+            TokenAccountOpts(program_id=self.SYSTEM_TOKEN_PROGRAM)
+        )
 
-        if not token_accounts:
-            return []
+        balances = {}
+        for token_account in response.value or []:
+            info = token_account.account.data.parsed.get("info", {})
+            mint = info.get("mint")
+            amount = float(info.get("tokenAmount", {}).get("uiAmount") or 0)
+            if mint and amount > 0:
+                balances[mint] = balances.get(mint, 0) + amount
 
-        # Получаем последние транзакции для всех токенов ПАРАЛЛЕЛЬНО
-        signature_tasks = [self.client.get_signatures_for_address(token) for token in token_accounts]
-        signatures = await asyncio.gather(*signature_tasks, return_exceptions=True)
+        logger.info(f"Found {len(balances)} tokens with balance for {wallet_address}")
+        return balances
 
-        # Извлекаем последние подписи, если они есть
-        last_signatures = [
-            sig.value[0].signature for sig in signatures if hasattr(sig, "value") and sig.value
-        ]
+    async def get_tokens(self, wallet_address: str, max_concurrency: int = 5) -> list:
+        """Оптимизированный метод получения токенов кошелька."""
+        balances = await self.get_token_balances(wallet_address)
 
-        if not last_signatures:
-            logger.info("No transactions found for tokens.")
+        if not balances:
             return []
 
-        # Параллельно запрашиваем информацию о транзакциях
-        transaction_tasks = [self.get_transaction(sig) for sig in last_signatures]
-        transactions = await asyncio.gather(*transaction_tasks, return_exceptions=True)
+        # Запрашиваем информацию о токенах параллельно, но не более max_concurrency одновременно
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-        mints = []
-        token_tasks = []
+        async def fetch_token_info(mint: str):
+            async with semaphore:
+                return await self.token_info(mint)
 
-        for mint, tx in zip(token_accounts, transactions):
-            if isinstance(tx, Exception):
-                logger.error(f"Skipping token {mint} due to transaction fetch error: {tx}")
-                continue
-
-            token_address = tx.get("token_address") if tx else None
-            if not token_address:
-                logger.error(f"Skipping token {mint} due to missing token_address in transaction")
-                continue
-
-            # Создаем асинхронную задачу для получения информации о токене
-            token_tasks.append(self.token_info(token_address))
+        token_infos = await asyncio.gather(
+            *(fetch_token_info(mint) for mint in balances),
+            return_exceptions=True
+        )
 
-        # Запрашиваем всю информацию о токенах параллельно
-        token_infos = await asyncio.gather(*token_tasks, return_exceptions=True)
-        for mint, ti in zip(token_accounts, token_infos):
+        mints = []
+        for (mint, amount), ti in zip(balances.items(), token_infos):
             if isinstance(ti, Exception):
                 logger.error(f"Skipping token {mint} due to token_info fetch error: {ti}")
                 continue
@@ -957,19 +999,9 @@ class SolanaClient:
             try:
                 token_name = ti["baseToken"].get("name", "Unknown")
                 token_symbol = ti["baseToken"].get("symbol", "Unknown")
-                address = ti["baseToken"].get("address")
                 market_cap = ti.get("marketCap", 0)
-                priceUsd = float(ti.get("priceUsd"))
-                print(address)
-                append = True
-                balance = 0
-                if tx_handler:
-                    balance = await tx_handler.client.get_token_balance(Pubkey.from_string(address))
-                    if not balance:
-                        append = False
-                    balance *= priceUsd
-                if append:
-                    mints.append((address, market_cap, token_name, token_symbol, balance))
+                price_usd = float(ti.get("priceUsd"))
+                mints.append((mint, market_cap, token_name, token_symbol, amount * price_usd, amount))
             except (KeyError, TypeError) as e:
                 traceback.print_exc()
                 logger.error(f"Error extracting token info for {mint}: {e}")
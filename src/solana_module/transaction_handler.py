@@ -1,5 +1,8 @@
+import asyncio
 import logging
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 # COMPUTE_UNIT_PRICE  # todo: change to select from db
@@ -45,7 +48,8 @@ class UserTransactionHandler:
         token_address: str,
         amount_sol: float,
         slippage: float = 1.0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        compute_unit_price: Optional[int] = None
     ) -> Optional[str]:
         """
         Buy token for specified amount of SOL
@@ -55,6 +59,7 @@ class UserTransactionHandler:
             amount_sol: Amount of SOL to spend
             slippage: Slippage tolerance in percentage
             max_retries: Maximum number of retry attempts
+            compute_unit_price: Price per compute unit for this call (client default if None)
             
         Returns:
             Transaction signature if successful, None otherwise
@@ -79,7 +84,8 @@ class UserTransactionHandler:
                 bonding_curve=bonding_curve_address,
                 associated_bonding_curve=associated_bonding_curve,
                 amount=amount_sol,
-                slippage=slippage / 100  # Convert percentage to decimal
+                slippage=slippage / 100,  # Convert percentage to decimal
+                compute_unit_price=compute_unit_price
             )
             
             if tx_signature:
@@ -99,7 +105,8 @@ class UserTransactionHandler:
         amount_tokens: float = None,
         sell_percentage: float = None,
         slippage: float = 1.0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        compute_unit_price: Optional[int] = None
     ) -> Optional[str]:
         """
         Sell specified amount of tokens
@@ -110,6 +117,7 @@ class UserTransactionHandler:
             sell_percentage: Percentage of tokens to sell (optional)
             slippage: Slippage tolerance in percentage
             max_retries: Maximum number of retry attempts
+            compute_unit_price: Price per compute unit for this call (client default if None)
             
         Returns:
             Transaction signature if successful, None otherwise
@@ -125,7 +133,7 @@ class UserTransactionHandler:
             # Get token balance if selling percentage
             if sell_percentage is not None:
                 # Get associated token account
-                associated_token_account = await self.client.create_associated_token_account(mint)
+                associated_token_account = await self.client.create_associated_token_account(mint, compute_unit_price)
                 # Get token balance
                 resp = await self.client.client.get_token_account_balance(associated_token_account)
                 token_balance = int(resp.value.amount)
@@ -141,9 +149,95 @@ class UserTransactionHandler:
                 bonding_curve=bonding_curve_address,
                 associated_bonding_curve=associated_bonding_curve,
                 token_amount=amount_tokens,
-                min_amount=slippage / 100  # Convert percentage to decimal
+                min_amount=slippage / 100,  # Convert percentage to decimal
+                compute_unit_price=compute_unit_price
             )
             
         except Exception as e:
             logger.error(f"Error selling token: {e}")
-            return None 
\ No newline at end of file
+            return None 
+
+
+# Кэш обработчиков по telegram_id: расшифровка ключа и загрузка keypair выполняются один раз.
+# Хранит расшифрованные ключи и RPC-клиенты, поэтому ограничен по размеру и времени жизни
+USER_HANDLERS_MAX_SIZE = 1000
+USER_HANDLER_TTL = 600
+# Вытесненный обработчик может ещё отправлять транзакцию (с повторами и подтверждением),
+# поэтому его RPC-клиент закрывается только спустя это время
+USER_HANDLER_CLOSE_DELAY = 300
+_user_handlers: "OrderedDict[int, Tuple[float, UserTransactionHandler]]" = OrderedDict()
+_pending_closes: Dict[asyncio.Task, UserTransactionHandler] = {}
+
+
+async def _close_handler(handler: UserTransactionHandler) -> None:
+    try:
+        await handler.client.client.close()
+    except Exception as e:
+        logger.error(f"[HANDLER] Error closing RPC client: {e}")
+
+
+async def _close_handler_later(handler: UserTransactionHandler) -> None:
+    await asyncio.sleep(USER_HANDLER_CLOSE_DELAY)
+    await _close_handler(handler)
+
+
+def _schedule_close(handler: UserTransactionHandler) -> None:
+    task = asyncio.get_running_loop().create_task(_close_handler_later(handler))
+    _pending_closes[task] = handler
+    task.add_done_callback(lambda done: _pending_closes.pop(done, None))
+
+
+def get_cached_user_handler(telegram_id: int) -> Optional[UserTransactionHandler]:
+    """Returns the cached handler for the user, if any and not expired"""
+    entry = _user_handlers.get(telegram_id)
+    now = time.monotonic()
+    if entry is None or now - entry[0] >= USER_HANDLER_TTL:
+        return None
+    # TTL отсчитывается от последнего использования
+    _user_handlers[telegram_id] = (now, entry[1])
+    _user_handlers.move_to_end(telegram_id)
+    return entry[1]
+
+
+async def cache_user_handler(telegram_id: int, handler: UserTransactionHandler) -> UserTransactionHandler:
+    """
+    Stores the handler so following callbacks of the user can reuse it.
+    If a concurrent miss already cached a handler, that one is returned instead.
+    """
+    now = time.monotonic()
+    previous = _user_handlers.get(telegram_id)
+    if previous is not None and previous[1] is not handler and now - previous[0] < USER_HANDLER_TTL:
+        # Новый обработчик ещё никто не использует - закрываем его сразу
+        await _close_handler(handler)
+        return get_cached_user_handler(telegram_id)
+
+    _user_handlers.pop(telegram_id, None)
+    if previous is not None and previous[1] is not handler:
+        _schedule_close(previous[1])
+    _user_handlers[telegram_id] = (now, handler)
+
+    # Вытесняем просроченные и самые давно использованные обработчики
+    for key in [key for key, (used, _) in _user_handlers.items() if now - used >= USER_HANDLER_TTL]:
+        _schedule_close(_user_handlers.pop(key)[1])
+    while len(_user_handlers) > USER_HANDLERS_MAX_SIZE:
+        _schedule_close(_user_handlers.popitem(last=False)[1][1])
+    return handler
+
+
+def invalidate_user_handler(telegram_id: int) -> None:
+    """Drops the cached handler, e.g. after the user's private key changed"""
+    entry = _user_handlers.pop(telegram_id, None)
+    if entry is not None:
+        _schedule_close(entry[1])
+
+
+async def close_user_handlers() -> None:
+    """Closes all cached and pending-close handlers on shutdown"""
+    handlers = [handler for _, handler in _user_handlers.values()]
+    _user_handlers.clear()
+    for task, handler in list(_pending_closes.items()):
+        task.cancel()
+        handlers.append(handler)
+    _pending_closes.clear()
+    for handler in handlers:
+        await _close_handler(handler)
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Объединяет параллельные вызовы с одинаковым ключом: пока вызов выполняется,
+    остальные ждут его результат (или его исключение) вместо повторного запроса.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                # shield - отмена одного ожидающего не отменяет общий результат для остальных
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    # Отменили сам ожидающий вызов
+                    raise
+                # Отменили первый вызов - ожидающие не отменялись, поэтому повторяем запрос:
+                # один из них станет новым первым, остальные дождутся его
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Ожидающие увидят отменённый future и повторят запрос
+            future.cancel()
+            raise
+        except BaseException as exc:
+            # Ожидающие получают ту же ошибку, что и первый вызов
+            future.set_exception(exc)
+            # Исключение считается полученным, даже если ожидающих не было
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def forget(self, key: Hashable):
+        """Новые вызовы с этим ключом не будут ждать уже выполняющийся"""
+        self._inflight.pop(key, None)
@@ -0,0 +1,46 @@
+import pytest
+
+from src.bot.utils.address import is_valid_token_address
+
+PUMP_MINT = "61V8vBaqAGMpgDQi4JcAwo1dmBGHsyhzodcPqnEVpump"
+WSOL_MINT = "So11111111111111111111111111111111111111112"
+SYSTEM_PROGRAM = "11111111111111111111111111111111"
+
+
+@pytest.mark.parametrize("address", [
+    PUMP_MINT,
+    WSOL_MINT,
+    SYSTEM_PROGRAM,
+    "1" * 32,
+    "z" * 44,
+])
+def test_accepts_base58_addresses_of_32_to_44_chars(address):
+    assert is_valid_token_address(address)
+
+
+@pytest.mark.parametrize("char", ["0", "O", "I", "l"])
+def test_rejects_non_base58_characters(char):
+    assert not is_valid_token_address(char + PUMP_MINT[1:])
+    assert not is_valid_token_address(PUMP_MINT[:-1] + char)
+
+
+@pytest.mark.parametrize("address", [
+    " " + PUMP_MINT,
+    PUMP_MINT + " ",
+    PUMP_MINT + "\n",
+    "\t" + SYSTEM_PROGRAM + "\t",
+])
+def test_rejects_surrounding_whitespace(address):
+    assert not is_valid_token_address(address)
+
+
+@pytest.mark.parametrize("address", [
+    "",
+    "1" * 31,
+    "1" * 45,
+    PUMP_MINT + "1",
+    PUMP_MINT * 2,
+    "1" * 10_000,
+])
+def test_rejects_too_short_and_too_long_input(address):
+    assert not is_valid_token_address(address)
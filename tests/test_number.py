@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from src.bot.utils.number import parse_number, try_parse_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1", 1.0),
+    ("0.01", 0.01),
+    ("1,5", 1.5),
+    (",5", 0.5),
+    (".5", 0.5),
+    ("5.", 5.0),
+    ("50%", 50.0),
+    ("  2,25  ", 2.25),
+    ("\t3 %\n", 3.0),
+    ("-1", -1.0),
+    ("-0,75", -0.75),
+])
+def test_parses_numbers(text, expected):
+    assert try_parse_number(text) == pytest.approx(expected)
+    assert parse_number(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", [
+    None,
+    "",
+    "   ",
+    "abc",
+    "1,2,3",
+    "1.2.3",
+    "1 000",
+    "--1",
+    "+1",
+    "%",
+    "1e5",
+    "inf",
+    "-inf",
+    "nan",
+    "NaN",
+    "Infinity",
+])
+def test_rejects_invalid_input(text):
+    assert try_parse_number(text) is None
+    with pytest.raises(ValueError):
+        parse_number(text)
+
+
+@pytest.mark.parametrize("text", ["9" * 400, "-" + "9" * 400, "9" * 400 + ",5"])
+def test_rejects_overflowing_values(text):
+    assert try_parse_number(text) is None
+    with pytest.raises(ValueError):
+        parse_number(text)
+
+
+def test_large_finite_value_is_kept():
+    number = try_parse_number("9" * 300)
+    assert number is not None and math.isfinite(number)
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def run():
+        return await asyncio.gather(*(flight.run("key", load) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight._inflight == {}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def run():
+        return await asyncio.gather(
+            flight.run("a", lambda: load("a")),
+            flight.run("b", lambda: load("b")),
+        )
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_exception_is_propagated_to_waiters():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("db error")
+
+    async def run():
+        return await asyncio.gather(*(flight.run("key", load) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._inflight == {}
+
+
+def test_next_call_after_failure_runs_again():
+    flight = SingleFlight()
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("temporary")
+        return "ok"
+
+    async def run():
+        with pytest.raises(ValueError):
+            await flight.run("key", load)
+        return await flight.run("key", load)
+
+    assert asyncio.run(run()) == "ok"
+    assert len(attempts) == 2
+
+
+def test_leader_cancellation_does_not_cancel_waiters():
+    flight = SingleFlight()
+    calls = []
+
+    async def run():
+        first_started = asyncio.Event()
+
+        async def load():
+            calls.append(1)
+            if len(calls) == 1:
+                first_started.set()
+                await asyncio.sleep(10)
+            await asyncio.sleep(0.01)
+            return "retried"
+
+        leader = asyncio.create_task(flight.run("key", load))
+        await first_started.wait()
+        waiters = [asyncio.create_task(flight.run("key", load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(run()) == ["retried"] * 3
+    # Первый вызов отменён, ожидающие повторили запрос один раз на всех
+    assert len(calls) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def run():
+        done = asyncio.Event()
+
+        async def load():
+            await done.wait()
+            return "value"
+
+        leader = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        done.set()
+        return await leader
+
+    assert asyncio.run(run()) == "value"
+
+
+def test_forget_makes_new_calls_start_a_new_request():
+    flight = SingleFlight()
+    calls = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def load():
+            calls.append(1)
+            if len(calls) == 1:
+                await release.wait()
+                return "stale"
+            return "fresh"
+
+        first = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        flight.forget("key")
+        second = await flight.run("key", load)
+        release.set()
+        return await first, second, dict(flight._inflight)
+
+    first, second, inflight = asyncio.run(run())
+    assert (first, second) == ("stale", "fresh")
+    assert len(calls) == 2
+    assert inflight == {}
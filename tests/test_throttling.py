@@ -0,0 +1,113 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.types import CallbackQuery, Message, User
+
+from src.bot.middleware.throttling import CallbackThrottlingMiddleware
+
+
+def _callback(data: str, user_id: int = 1) -> CallbackQuery:
+    return CallbackQuery(
+        id=f"{user_id}:{data}",
+        from_user=User(id=user_id, is_bot=False, first_name="user"),
+        chat_instance="chat",
+        data=data,
+    )
+
+
+@pytest.fixture
+def answer():
+    with patch.object(CallbackQuery, "answer", new_callable=AsyncMock) as mock:
+        yield mock
+
+
+def test_first_callback_passes_through(answer):
+    middleware = CallbackThrottlingMiddleware()
+    handler = AsyncMock(return_value="handled")
+    event = _callback("sell_100")
+
+    result = asyncio.run(middleware(handler, event, {}))
+
+    assert result == "handled"
+    handler.assert_awaited_once_with(event, {})
+    answer.assert_not_awaited()
+
+
+def test_duplicate_within_window_is_dropped_and_answered(answer):
+    middleware = CallbackThrottlingMiddleware(window=60)
+    handler = AsyncMock()
+
+    async def press_twice():
+        await middleware(handler, _callback("sell_100"), {})
+        return await middleware(handler, _callback("sell_100"), {})
+
+    assert asyncio.run(press_twice()) is None
+    handler.assert_awaited_once()
+    answer.assert_awaited_once()
+
+
+def test_duplicate_while_in_flight_is_dropped_and_answered(answer):
+    middleware = CallbackThrottlingMiddleware(window=0)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = []
+
+    async def slow_handler(event, data):
+        calls.append(event.data)
+        started.set()
+        await release.wait()
+
+    async def run():
+        first = asyncio.create_task(middleware(slow_handler, _callback("confirm_sell"), {}))
+        await started.wait()
+        await middleware(slow_handler, _callback("confirm_sell"), {})
+        release.set()
+        await first
+
+    asyncio.run(run())
+    assert calls == ["confirm_sell"]
+    answer.assert_awaited_once()
+
+
+def test_callback_passes_again_after_window(answer):
+    middleware = CallbackThrottlingMiddleware(window=0)
+    handler = AsyncMock()
+
+    async def press_twice():
+        await middleware(handler, _callback("edit_antimev"), {})
+        await middleware(handler, _callback("edit_antimev"), {})
+
+    asyncio.run(press_twice())
+    assert handler.await_count == 2
+    answer.assert_not_awaited()
+
+
+@pytest.mark.parametrize("first, second", [
+    (_callback("sell_100", user_id=1), _callback("sell_100", user_id=2)),
+    (_callback("sell_100"), _callback("sell_50")),
+    (_callback("buy_1"), _callback("buy_1")),
+])
+def test_other_users_data_and_prefixes_pass_through(answer, first, second):
+    middleware = CallbackThrottlingMiddleware(window=60)
+    handler = AsyncMock()
+
+    async def press_both():
+        await middleware(handler, first, {})
+        await middleware(handler, second, {})
+
+    asyncio.run(press_both())
+    assert handler.await_count == 2
+    answer.assert_not_awaited()
+
+
+def test_non_callback_events_pass_through(answer):
+    middleware = CallbackThrottlingMiddleware(window=60)
+    handler = AsyncMock()
+    event = Message.model_construct(text="sell_100")
+
+    asyncio.run(middleware(handler, event, {}))
+    asyncio.run(middleware(handler, event, {}))
+
+    assert handler.await_count == 2
+    answer.assert_not_awaited()